@@ -0,0 +1,101 @@
+# file: ann_index.py
+
+from typing import List, Optional
+
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Indeks inverted-file (IVF) untuk embedding yang sudah dinormalisasi, murni NumPy.
+
+    Centroid dilatih dengan k-means sferis pada sampel embedding; setiap vektor masuk ke daftar
+    milik centroid terdekat (dot product terbesar) dan hanya id-nya yang disimpan, bukan embedding.
+    search() memeriksa n_probe centroid terdekat dengan query dan mengembalikan semua id di daftar
+    tersebut sebagai kandidat; skor akhir dihitung pemanggil dari embedding aslinya.
+    Penambahan bersifat inkremental (centroid tetap); pemanggil melatih ulang lewat train() + add()
+    jika data sudah tumbuh jauh melewati data latih.
+    """
+    _INITIAL_LIST_CAPACITY = 16
+
+    def __init__(self, dim: int, n_probe: int = 8, kmeans_iterations: int = 8, seed: int = 0):
+        self.dim = dim
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self._rng = np.random.default_rng(seed)
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._counts = np.zeros(0, dtype=np.int64)
+        self.size = 0
+
+    @property
+    def trained(self) -> bool: return self.centroids is not None
+
+    @property
+    def n_lists(self) -> int: return 0 if self.centroids is None else len(self.centroids)
+
+    @staticmethod
+    def lists_for(n: int) -> int:
+        """Jumlah daftar yang wajar untuk n vektor: sekitar sqrt(n)."""
+        return int(np.clip(np.sqrt(n), 16, 4096))
+
+    def train(self, sample: np.ndarray, n_lists: int):
+        """Melatih centroid dari sampel (baris dinormalisasi) dan mengosongkan semua daftar."""
+        sample = np.asarray(sample, dtype=np.float32)
+        n_lists = max(1, min(n_lists, len(sample)))
+        centroids = sample[self._rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind='stable')
+            members, starts = np.unique(assignment[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[members] = np.add.reduceat(sample[order], starts, axis=0)
+            norms = np.linalg.norm(sums, axis=1)
+            # Centroid tanpa anggota dipertahankan; yang lain menjadi rata-rata anggotanya (dinormalisasi)
+            filled = norms > 0
+            centroids[filled] = sums[filled] / norms[filled, None]
+        self.centroids = centroids
+        self._lists = [np.empty(self._INITIAL_LIST_CAPACITY, dtype=np.int64) for _ in range(n_lists)]
+        self._counts = np.zeros(n_lists, dtype=np.int64)
+        self.size = 0
+
+    def add(self, embeddings: np.ndarray, ids: np.ndarray):
+        """Memasukkan vektor (baris dinormalisasi) dengan id-nya ke daftar centroid terdekat."""
+        if len(ids) == 0: return
+        assignment = np.argmax(np.asarray(embeddings, dtype=np.float32) @ self.centroids.T, axis=1)
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 1:
+            self._append(int(assignment[0]), ids)
+        else:
+            order = np.argsort(assignment, kind='stable')
+            lists, starts = np.unique(assignment[order], return_index=True)
+            for list_id, chunk in zip(lists, np.split(ids[order], starts[1:])):
+                self._append(int(list_id), chunk)
+        self.size += len(ids)
+
+    def _append(self, list_id: int, ids: np.ndarray):
+        items, count = self._lists[list_id], self._counts[list_id]
+        end = count + len(ids)
+        if end > len(items):
+            grown = np.empty(max(end, 2 * len(items)), dtype=np.int64)
+            grown[:count] = items[:count]
+            self._lists[list_id] = items = grown
+        items[count:end] = ids
+        self._counts[list_id] = end
+
+    def search(self, query: np.ndarray, n_probe: Optional[int] = None) -> np.ndarray:
+        """Id kandidat dari n_probe daftar dengan centroid paling mirip query (tidak berurutan)."""
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        similarity = self.centroids @ np.asarray(query, dtype=np.float32)
+        probes = np.argpartition(-similarity, n_probe - 1)[:n_probe] if n_probe < self.n_lists else np.arange(self.n_lists)
+        return np.concatenate([self._lists[p][:self._counts[p]] for p in probes])
+
+    def stats(self) -> dict:
+        counts = self._counts
+        return {
+            "size": self.size,
+            "lists": self.n_lists,
+            "n_probe": self.n_probe,
+            "largest_list": int(counts.max()) if len(counts) else 0,
+            "mean_list": float(counts.mean()) if len(counts) else 0.0,
+        }
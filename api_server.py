@@ -1,15 +1,23 @@
 # file: api_server.py
 
 import asyncio
-from fastapi import FastAPI
-from typing import List, Dict
+import json
+import os
+import re
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import List, Dict, Optional
 from pydantic import BaseModel
 
 # BARU: Impor CORSMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
 # Impor kelas-kelas inti dari simulasi kita
-from simulation_core import Environment, Agent
+from simulation_core import Environment, Agent, embedding_model
+from simulation_runner import SimulationRunner
+from checkpoint import has_checkpoint, load_checkpoint
+import metrics
+from world_pool import WorkerDiedError, WorldExistsError, WorldNotFoundError, WorldPool
 
 # --- (Definisi Pydantic Model tidak berubah) ---
 class AgentState(BaseModel):
@@ -21,6 +29,31 @@ class SimulationState(BaseModel):
     simulation_time: str
     agents: List[AgentState]
 
+class ExternalEvent(BaseModel):
+    description: str
+    location: Optional[str] = None  # hanya agen di lokasi ini
+    agents: Optional[List[str]] = None  # hanya agen dengan nama ini
+
+class EventBatch(BaseModel):
+    events: List[ExternalEvent]
+
+class AgentSpec(BaseModel):
+    name: str
+    description: str
+    location: str
+
+class WorldConfig(BaseModel):
+    agents: List[AgentSpec]
+    start_time: str = "08:00"
+    step_mode: str = "sequential"
+    scheduler: str = "every_tick"
+    reflection_mode: str = "inline"
+    batch_importance: Optional[bool] = None
+    ann_index: bool = False
+    step_interval: Optional[float] = None
+    plan_day: bool = True
+    paused: bool = False
+
 # 1. Inisialisasi Aplikasi FastAPI
 app = FastAPI(
     title="Generative Agents Simulation API",
@@ -44,53 +77,211 @@ app.add_middleware(
 # --- AKHIR DARI KONFIGURASI CORS ---
 
 
-# 2. Setup Simulasi (Tidak ada perubahan)
+# 2. Setup Simulasi: lanjutkan dari checkpoint jika ada, jika tidak bangun dunia baru
+CHECKPOINT_DIR = os.environ.get("SIMULATION_CHECKPOINT_DIR", "checkpoints/default")
 print("--- MEMPERSIAPKAN SIMULASI ---")
-sim_environment = Environment(start_time_str="08:00")
-john = Agent(name="John", description="Seorang pandai besi yang rajin.", location="Rumah")
-jane = Agent(name="Jane", description="Seorang seniman yang suka berjalan-jalan di taman.", location="Rumah")
-sim_environment.add_agent(john)
-sim_environment.add_agent(jane)
-john.plan_day()
-jane.plan_day()
+if has_checkpoint(CHECKPOINT_DIR):
+    sim_environment = load_checkpoint(CHECKPOINT_DIR)
+    print(f"Simulasi dipulihkan dari checkpoint '{CHECKPOINT_DIR}' ({sim_environment.current_time.strftime('%H:%M')}).")
+else:
+    sim_environment = Environment(start_time_str="08:00")
+    john = Agent(name="John", description="Seorang pandai besi yang rajin.", location="Rumah")
+    jane = Agent(name="Jane", description="Seorang seniman yang suka berjalan-jalan di taman.", location="Rumah")
+    sim_environment.add_agent(john)
+    sim_environment.add_agent(jane)
+    john.plan_day()
+    jane.plan_day()
 print("--- SIMULASI SIAP ---")
 
 
-# --- (Sisa file tidak ada perubahan) ---
-async def run_simulation_background():
-    """Tugas yang berjalan di latar belakang untuk menjalankan simulasi."""
-    while True:
-        sim_environment.run_step()
-        await asyncio.sleep(1)
+# Simulasi berjalan di thread tersendiri; endpoint hanya membaca snapshot terakhir
+sim_runner = SimulationRunner(sim_environment, step_interval=1.0, checkpoint_path=CHECKPOINT_DIR, checkpoint_every=60)
+
+# Metrik yang dibaca langsung dari state simulasi saat /metrics diminta
+metrics.registry.gauge("simulation_agents", "Jumlah agen dalam simulasi").set_function(lambda: len(sim_environment.agents))
+metrics.registry.gauge("simulation_reflection_queue_depth", "Refleksi yang menunggu di ReflectionPipeline").set_function(
+    lambda: sim_environment.reflection_pipeline.queue_depth if sim_environment.reflection_pipeline is not None else 0)
+metrics.registry.gauge("simulation_decisions_skipped", "Keputusan yang dilewati TickScheduler sejak start").set_function(
+    lambda: sim_environment.scheduler.skipped)
+# Trace per tick (format Chrome Trace Event) bisa diaktifkan dengan SIMULATION_TRACE_PATH=trace.json
+TRACE_PATH = os.environ.get("SIMULATION_TRACE_PATH")
+
+# Dunia tambahan (/worlds/...) berjalan di proses pekerja; dunia bawaan di atas tetap di proses ini
+DEFAULT_WORLD_ID = "default"
+# Batas tunggu balasan pekerja per perintah dunia (hapus dunia bisa menunggu tick + checkpoint terakhir)
+WORLD_COMMAND_TIMEOUT = float(os.environ.get("SIMULATION_WORLD_TIMEOUT", "60"))
+WORLD_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+world_pool = WorldPool(
+    num_workers=int(os.environ.get("SIMULATION_WORKERS", max(1, (os.cpu_count() or 2) // 2))),
+    checkpoint_root=os.environ.get("SIMULATION_WORLDS_DIR", "checkpoints/worlds") or None,
+)
 
 @app.on_event("startup")
 async def startup_event():
-    """Saat server FastAPI dimulai, jalankan simulasi di latar belakang."""
+    """Saat server FastAPI dimulai, jalankan simulasi di thread latar belakang."""
     print("Server startup: Memulai loop simulasi di background...")
-    asyncio.create_task(run_simulation_background())
+    # Model embedding dimuat di thread terpisah; /state sudah bisa dilayani selama pemuatan
+    embedding_model.warm_up(background=True)
+    if TRACE_PATH:
+        metrics.enable_trace(TRACE_PATH)
+    sim_runner.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Environment.shutdown menghapus file sementara tingkat dingin; hanya aman jika thread simulasi sudah berhenti
+    if sim_runner.stop(timeout=5):
+        sim_runner.env.shutdown()
+    await asyncio.to_thread(world_pool.shutdown)
+    metrics.disable_trace()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Metrik latensi per fase, panggilan LLM/embedding, dan cache dalam format teks Prometheus."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+def _state_response(snapshot, request: Request) -> Response:
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 @app.get("/state", response_model=SimulationState)
-async def get_simulation_state():
+async def get_simulation_state(request: Request):
     """
     Endpoint untuk mendapatkan status terbaru dari semua agen dalam simulasi.
+    Mendukung ETag: jika If-None-Match cocok dengan versi terakhir, dibalas 304 tanpa body.
     """
-    agent_states = []
-    for agent in sim_environment.agents:
-        agent_states.append({
-            "name": agent.name,
-            "location": agent.location,
-            "status": agent.status
-        })
-    
-    return {
-        "simulation_time": sim_environment.current_time.strftime("%Y-%m-%d %H:%M"),
-        "agents": agent_states
-    }
+    return _state_response(sim_runner.snapshot, request)
+
+@app.get("/stream")
+async def stream_simulation_state(request: Request):
+    """
+    Server-Sent Events: event `snapshot` berisi status penuh saat tersambung,
+    lalu event `delta` per tick berisi hanya agen yang berubah.
+    """
+    subscriber_queue = sim_runner.subscribe()
+
+    async def event_source():
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(sim_runner.snapshot.to_dict())}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    kind, payload = await asyncio.wait_for(subscriber_queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            sim_runner.unsubscribe(subscriber_queue)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.post("/event")
 async def add_external_event(event_description: str):
     """Endpoint untuk menyuntikkan event dari luar ke dalam simulasi."""
     print(f"Event eksternal diterima: {event_description}")
-    for agent in sim_environment.agents:
-        agent.observe(f"Sebuah peristiwa tak terduga terjadi: {event_description}")
-    return {"message": "Event successfully added to all agents' memory."}
\ No newline at end of file
+    sim_runner.submit_event(event_description)
+    return {"message": "Event queued for all agents' memory before the next simulation step."}
+
+def _event_payload(batch: EventBatch) -> List[dict]:
+    return [event.dict(exclude_none=True) for event in batch.events]
+
+@app.post("/events", status_code=202)
+async def add_external_events(batch: EventBatch):
+    """
+    Event massal. Skor kepentingan dan embedding dihitung sekali per teks unik di latar belakang,
+    lalu memorinya disebar ke setiap agen penerima sebelum tick berikutnya.
+    """
+    events = _event_payload(batch)
+    sim_runner.submit_events(events)
+    return {"accepted": len(events), "unique_descriptions": len({e["description"] for e in events})}
+
+
+# --- MULTI-DUNIA ---
+async def _call_world(world_id: str, command, *args):
+    """Menjalankan perintah WorldPool dan menerjemahkan kesalahannya ke status HTTP."""
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(command(world_id, *args)), WORLD_COMMAND_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Pekerja dunia '{world_id}' tidak membalas dalam {WORLD_COMMAND_TIMEOUT:g} detik")
+    except WorkerDiedError as e:
+        raise HTTPException(status_code=503, detail=f"{e}; dunia '{world_id}' dilepas dan bisa dibuat ulang")
+    except WorldNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dunia '{world_id}' tidak ditemukan")
+    except WorldExistsError:
+        raise HTTPException(status_code=409, detail=f"Dunia '{world_id}' sudah ada")
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/worlds")
+async def list_worlds():
+    """Semua dunia beserta pekerja, jam simulasi, jumlah agen, dan status jeda."""
+    snapshot = sim_runner.snapshot
+    default = {"id": DEFAULT_WORLD_ID, "worker": None, "ready": True, "paused": sim_runner.paused,
+               "simulation_time": snapshot.simulation_time, "agents": len(snapshot.agents)}
+    return {"worlds": [default] + world_pool.list_worlds()}
+
+@app.post("/worlds/{world_id}", status_code=201)
+async def create_world(world_id: str, config: WorldConfig):
+    """Membuat dunia baru di salah satu proses pekerja (dipulihkan dari checkpoint jika ada)."""
+    if world_id == DEFAULT_WORLD_ID:
+        raise HTTPException(status_code=409, detail=f"Dunia '{world_id}' sudah ada")
+    if not WORLD_ID_PATTERN.match(world_id):
+        raise HTTPException(status_code=400, detail="Id dunia hanya boleh berisi huruf, angka, '_' dan '-' (maks. 64)")
+    payload = config.dict(exclude_none=True)
+    payload["agents"] = [agent.dict() for agent in config.agents]
+    result = await _call_world(world_id, world_pool.create_world, payload)
+    return {"id": world_id, **result}
+
+@app.delete("/worlds/{world_id}")
+async def delete_world(world_id: str):
+    if world_id == DEFAULT_WORLD_ID:
+        raise HTTPException(status_code=400, detail="Dunia bawaan tidak bisa dihapus")
+    await _call_world(world_id, world_pool.delete_world)
+    return {"id": world_id, "deleted": True}
+
+@app.post("/worlds/{world_id}/pause")
+async def pause_world(world_id: str):
+    if world_id == DEFAULT_WORLD_ID:
+        sim_runner.pause()
+    else:
+        await _call_world(world_id, world_pool.pause_world)
+    return {"id": world_id, "paused": True}
+
+@app.post("/worlds/{world_id}/resume")
+async def resume_world(world_id: str):
+    if world_id == DEFAULT_WORLD_ID:
+        sim_runner.resume()
+    else:
+        await _call_world(world_id, world_pool.resume_world)
+    return {"id": world_id, "paused": False}
+
+@app.get("/worlds/{world_id}/state", response_model=SimulationState)
+async def get_world_state(world_id: str, request: Request):
+    """Sama seperti /state, untuk dunia tertentu; dilayani dari snapshot yang disimpan proses induk."""
+    if world_id == DEFAULT_WORLD_ID:
+        return _state_response(sim_runner.snapshot, request)
+    try:
+        snapshot = world_pool.snapshot(world_id)
+    except WorldNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dunia '{world_id}' tidak ditemukan")
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail=f"Dunia '{world_id}' masih disiapkan", headers={"Retry-After": "1"})
+    return _state_response(snapshot, request)
+
+@app.post("/worlds/{world_id}/event")
+async def add_world_event(world_id: str, event_description: str):
+    if world_id == DEFAULT_WORLD_ID:
+        sim_runner.submit_event(event_description)
+    else:
+        await _call_world(world_id, world_pool.submit_event, event_description)
+    return {"message": f"Event queued for all agents in world '{world_id}' before its next simulation step."}
+
+@app.post("/worlds/{world_id}/events", status_code=202)
+async def add_world_events(world_id: str, batch: EventBatch):
+    events = _event_payload(batch)
+    if world_id == DEFAULT_WORLD_ID:
+        sim_runner.submit_events(events)
+    else:
+        await _call_world(world_id, world_pool.submit_events, events)
+    return {"accepted": len(events), "unique_descriptions": len({e["description"] for e in events})}
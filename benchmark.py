@@ -0,0 +1,756 @@
+# file: benchmark.py
+"""
+Benchmark skala untuk simulation_core memakai backend LLM dan embedding tiruan (tanpa Ollama,
+tanpa model). Contoh:
+
+    python benchmark.py --agents 2,50,200 --memories 0,1000,10000 --locations 5,20 --steps 10 --output bench.json
+    python benchmark.py --embedding-backends hash,torch,onnx,onnx-quantized
+    python benchmark.py --time-to-decision
+    python benchmark.py --event-ingestion --llm-latency 0.005
+
+Setiap konfigurasi dijalankan di proses anak (fork) tersendiri agar peak RSS tidak tercampur.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import select
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import metrics
+import ollama_interface
+from embedding_service import EmbeddingService, HashEmbeddingBackend, create_embedding_backend
+from llm_backend import LiveBackend
+from ollama_client import OllamaClient
+from prompt_builder import decision_context
+import simulation_core
+from simulation_core import Agent, Environment, Memory, MemoryStream
+
+class StubLLMBackend:
+    """
+    Backend LLM deterministik (respons ditentukan hash prompt), dengan latensi sintetis opsional.
+    stay_probability: peluang keputusan agen berupa "tetap di lokasi dan status sekarang", agar dunia
+    bisa tenang seperti simulasi sungguhan (0 = agen selalu berpindah/berganti status secara acak).
+    Skor kepentingan ditentukan hash teks peristiwa, jadi sama untuk prompt tunggal dan prompt bernomor;
+    batch_malformed/batch_drift: peluang satu item prompt bernomor dijawab rusak / meleset satu poin.
+    """
+    mode = "stub"
+
+    def __init__(self, locations: List[str], latency: float = 0.0, stay_probability: float = 0.0,
+                 batch_malformed: float = 0.0, batch_drift: float = 0.0):
+        self.locations = locations
+        self.latency = latency
+        self.stay_probability = stay_probability
+        self.batch_malformed = batch_malformed
+        self.batch_drift = batch_drift
+        self.calls = 0
+
+    @staticmethod
+    def _hash(text: str) -> int:
+        return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def _batch_scores(self, prompt: str) -> str:
+        lines = []
+        for number, text in re.findall(r'^(\d+)\. "(.*)"$', prompt, re.MULTILINE):
+            h = self._hash(text)
+            roll = (h >> 20) % 1000
+            if roll < 1000 * self.batch_malformed:
+                lines.append(f"{number}: tidak yakin")
+                continue
+            score = 1 + h % 10
+            if roll < 1000 * (self.batch_malformed + self.batch_drift):
+                score = score + 1 if score < 10 else score - 1
+            lines.append(f"{number}: {score}")
+        return "\n".join(lines)
+
+    def generate(self, model: str, prompt: str, options=None, stop_when=None) -> str:
+        self.calls += 1
+        if self.latency: time.sleep(self.latency)
+        h = self._hash(prompt)
+        if "Skor Kepentingan per nomor" in prompt:
+            return self._batch_scores(prompt)
+        if "Skor Kepentingan" in prompt:
+            event = re.search(r'Peristiwa: "(.*)"\s*\n\s*Skor Kepentingan', prompt, re.DOTALL)
+            return str(1 + self._hash(event.group(1) if event else prompt) % 10)
+        if "Tindakan Anda sekarang" in prompt:
+            if (h % 1000) < 1000 * self.stay_probability:
+                location = re.search(r"Lokasi saat ini: (.*)\.\n", prompt)
+                status = re.search(r"Status saat ini: (.*)\.\n", prompt)
+                if location and status:
+                    return f"{location.group(1)} :: {status.group(1)}"
+            return f"{self.locations[h % len(self.locations)]} :: Melakukan aktivitas {h % 7}."
+        if "Rencana Anda untuk hari ini" in prompt:
+            return "08:00 - Sarapan.\n09:00 - Bekerja.\n12:00 - Makan siang.\n18:00 - Makan malam.\n22:00 - Tidur."
+        return f"Wawasan sintetis nomor {h % 100}."
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "calls": self.calls}
+
+
+class PhaseTimer:
+    """Membungkus fungsi/metode sementara untuk mencatat durasi per fase kognisi."""
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._patches = []
+
+    def wrap(self, owner, attr: str, phase: str):
+        original = getattr(owner, attr)
+        samples = self.samples[phase]
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - started)
+
+        setattr(owner, attr, timed)
+        self._patches.append((owner, attr, original))
+
+    def restore(self):
+        for owner, attr, original in reversed(self._patches):
+            setattr(owner, attr, original)
+        self._patches.clear()
+
+    def summary(self) -> dict:
+        result = {}
+        for phase, samples in self.samples.items():
+            arr = np.array(samples) * 1000 if samples else np.zeros(1)
+            result[phase] = {
+                "calls": len(samples),
+                "total_ms": float(arr.sum()) if samples else 0.0,
+                "mean_ms": float(arr.mean()) if samples else 0.0,
+                "p50_ms": float(np.percentile(arr, 50)) if samples else 0.0,
+                "p95_ms": float(np.percentile(arr, 95)) if samples else 0.0,
+            }
+        return result
+
+
+def install_stubs(locations: List[str], llm_latency: float = 0.0, llm_stay: float = 0.0) -> StubLLMBackend:
+    backend = StubLLMBackend(locations, latency=llm_latency, stay_probability=llm_stay)
+    ollama_interface.set_backend(backend)
+    # Layanan embedding baru (cache kosong) agar setiap konfigurasi mulai dari kondisi yang sama
+    simulation_core.embedding_service = EmbeddingService(HashEmbeddingBackend())
+    # Cache skor kepentingan persisten tidak dipakai agar hasil tidak bergantung pada run sebelumnya
+    ollama_interface.importance_cache = ollama_interface.ImportanceCache(path=None)
+    return backend
+
+
+def build_environment(n_agents: int, n_memories: int, n_locations: int, seed: int = 0, step_mode: str = "sequential",
+                      embedding_dtype: str = "float32", ram_budget_mb: Optional[float] = None,
+                      reflection_mode: str = "inline", scheduler: str = "every_tick",
+                      batch_importance: Optional[bool] = None) -> Environment:
+    """Dunia sintetis: agen tersebar acak di n_locations, masing-masing dengan n_memories memori terisi."""
+    rng = random.Random(seed)
+    locations = [f"Lokasi {i}" for i in range(n_locations)]
+    env = Environment(start_time_str="08:00", step_mode=step_mode, reflection_mode=reflection_mode, scheduler=scheduler,
+                      batch_importance=batch_importance)
+    encoder = simulation_core.embedding_service.model
+    vocabulary = [f"kejadian sintetis {i} di {locations[i % n_locations]}." for i in range(max(1, min(n_memories, 5000)))]
+    vocab_embeddings = encoder.encode(vocabulary)
+    for a in range(n_agents):
+        agent = Agent(name=f"Agen{a}", description=f"Warga sintetis nomor {a}.", location=rng.choice(locations),
+                      memory_stream=MemoryStream(embedding_dtype=embedding_dtype, ram_budget_mb=ram_budget_mb))
+        agent.daily_plan = {"08:00": "Sarapan.", "09:00": "Bekerja.", "12:00": "Makan siang."}
+        base = env.current_time - timedelta(minutes=n_memories)
+        for m in range(n_memories):
+            v = rng.randrange(len(vocabulary))
+            agent.memory_stream.add_precomputed(Memory.precomputed(
+                base + timedelta(minutes=m), vocabulary[v], 1 + rng.randrange(10), vocab_embeddings[v]))
+        env.add_agent(agent)
+    return env
+
+
+def run_config(n_agents: int, n_memories: int, n_locations: int, steps: int, llm_latency: float = 0.0,
+               step_mode: str = "sequential", embedding_dtype: str = "float32", ram_budget_mb: Optional[float] = None,
+               reflection_mode: str = "inline", scheduler: str = "every_tick", llm_stay: float = 0.0,
+               batch_importance: Optional[bool] = None) -> dict:
+    locations = [f"Lokasi {i}" for i in range(n_locations)]
+    backend = install_stubs(locations, llm_latency, llm_stay)
+    setup_started = time.perf_counter()
+    env = build_environment(n_agents, n_memories, n_locations, step_mode=step_mode,
+                            embedding_dtype=embedding_dtype, ram_budget_mb=ram_budget_mb, reflection_mode=reflection_mode,
+                            scheduler=scheduler, batch_importance=batch_importance)
+    setup_s = time.perf_counter() - setup_started
+
+    timer = PhaseTimer()
+    timer.wrap(Agent, "observe", "observe")
+    timer.wrap(simulation_core.embedding_service.model, "encode", "embed")
+    timer.wrap(simulation_core, "get_importance_score", "importance")
+    timer.wrap(simulation_core, "get_importance_scores", "importance_batch")
+    timer.wrap(MemoryStream, "retrieve_memories", "retrieve")
+    timer.wrap(simulation_core, "decide_next_action", "decide")
+    timer.wrap(simulation_core, "generate_reflection", "reflect_llm")
+    timer.wrap(Environment, "get_observations_for", "world_update")
+    timer.wrap(simulation_core.WorldSnapshot, "get_observations_for", "world_update")
+    timer.wrap(Agent, "apply_action", "world_update")
+
+    reflection_stats = None
+    step_times = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            for _ in range(steps):
+                started = time.perf_counter()
+                env.run_step()
+                step_times.append(time.perf_counter() - started)
+        finally:
+            timer.restore()
+            if env.reflection_pipeline is not None: reflection_stats = env.reflection_pipeline.stats()
+            env.shutdown()
+
+    total = sum(step_times)
+    return {
+        "agents": n_agents,
+        "memories_per_agent": n_memories,
+        "locations": n_locations,
+        "steps": steps,
+        "step_mode": step_mode,
+        "reflection_mode": reflection_mode,
+        "reflection_pipeline": reflection_stats,
+        "scheduler": env.scheduler.stats(),
+        "batch_importance": env.batch_importance,
+        "llm_latency_s": llm_latency,
+        "llm_stay_probability": llm_stay,
+        "embedding_dtype": embedding_dtype,
+        "ram_budget_mb": ram_budget_mb,
+        "setup_s": setup_s,
+        "step_mean_ms": 1000 * total / steps if steps else 0.0,
+        "step_p95_ms": float(np.percentile(np.array(step_times) * 1000, 95)) if step_times else 0.0,
+        "steps_per_s": steps / total if total else 0.0,
+        "phases": timer.summary(),
+        "llm_calls": backend.calls,
+        "embedding_cache": simulation_core.embedding_service.stats(),
+        # ru_maxrss dalam KB di Linux (byte di macOS)
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    }
+
+
+def _run_isolated(queue, kwargs):
+    try:
+        queue.put(("ok", run_config(**kwargs)))
+    except BaseException as e:
+        queue.put(("error", repr(e)))
+        raise
+
+
+def run_isolated(**kwargs) -> dict:
+    """Menjalankan satu konfigurasi di proses anak agar peak RSS terukur per konfigurasi."""
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_isolated, args=(queue, kwargs))
+    process.start()
+    status, result = queue.get()
+    process.join()
+    if status != "ok":
+        raise RuntimeError(f"Konfigurasi {kwargs} gagal: {result}")
+    return result
+
+
+def benchmark_embedding_backends(names: List[str], batch_size: int = 32, repeats: int = 5) -> List[dict]:
+    """Waktu cold start (muat model) dan latensi encode per backend embedding."""
+    texts = [f"Agen {i} sendirian di Lokasi {i % 7}." for i in range(batch_size)]
+    results = []
+    for name in names:
+        backend = create_embedding_backend(name)
+        started = time.perf_counter()
+        backend.load()
+        cold_start = time.perf_counter() - started
+        backend.encode(texts[:1])  # pemanasan pertama tidak dihitung
+        single, batch = [], []
+        for i in range(repeats):
+            started = time.perf_counter(); backend.encode(texts[i % batch_size]); single.append(time.perf_counter() - started)
+            started = time.perf_counter(); backend.encode(texts); batch.append(time.perf_counter() - started)
+        results.append({
+            "backend": name,
+            "cold_start_s": cold_start,
+            "encode_single_ms": 1000 * float(np.median(single)),
+            "encode_batch_ms": 1000 * float(np.median(batch)),
+            "encode_batch_ms_per_text": 1000 * float(np.median(batch)) / batch_size,
+        })
+        print(f"embedding={name:<15} cold_start={cold_start:7.2f} s  single={results[-1]['encode_single_ms']:7.2f} ms  "
+              f"batch{batch_size}={results[-1]['encode_batch_ms']:8.2f} ms")
+    return results
+
+
+class StubOllamaServer:
+    """
+    Server /api/generate tiruan untuk mengukur waktu-ke-keputusan tanpa model sungguhan.
+    - evaluasi prompt: prompt_ms_per_char per karakter di luar awalan yang sama dengan prompt di salah
+      satu slot cache (meniru penggunaan ulang KV cache oleh Ollama)
+    - generasi: token_ms per token, berhenti pada num_predict atau saat klien memutus koneksi
+    Jawabannya sengaja bertele-tele: baris jawaban yang berguna diikuti penjelasan panjang.
+    """
+    def __init__(self, prompt_ms_per_char: float = 0.05, token_ms: float = 15.0, cache_slots: int = 4,
+                 verbose_tokens: int = 80):
+        self.prompt_ms_per_char = prompt_ms_per_char
+        self.token_ms = token_ms
+        self.cache_slots = cache_slots
+        self.verbose_tokens = verbose_tokens
+        self.prompt_chars_evaluated = 0
+        self.tokens_generated = 0
+        self._slots: List[str] = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.host = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread: Optional[threading.Thread] = None
+
+    def _prefill_chars(self, prompt: str) -> int:
+        with self._lock:
+            best_slot, best = None, 0
+            for i, cached in enumerate(self._slots):
+                common = len(os.path.commonprefix([cached, prompt]))
+                if common > best: best_slot, best = i, common
+            if best_slot is not None:
+                self._slots.pop(best_slot)
+            elif len(self._slots) >= self.cache_slots:
+                self._slots.pop(0)
+            self._slots.append(prompt)
+            self.prompt_chars_evaluated += len(prompt) - best
+        return len(prompt) - best
+
+    def _answer_tokens(self, prompt: str) -> List[str]:
+        if "Skor Kepentingan" in prompt:
+            head = " 4"
+        elif "Tindakan Anda sekarang" in prompt:
+            head = "Bengkel :: Memalu besi panas."
+        else:
+            head = "Wawasan singkat."
+        tail = " ".join(f"penjelasan{i}" for i in range(self.verbose_tokens))
+        return re.findall(r"\s*\S+", f"{head}\n\nAlasan: {tail}")
+
+    def _count_tokens(self, n: int):
+        with self._lock:
+            self.tokens_generated += n
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.0"
+
+            def log_message(self, *args):
+                pass
+
+            def _client_gone(self) -> bool:
+                readable, _, _ = select.select([self.connection], [], [], 0)
+                return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = body.get("prompt", "")
+                time.sleep(server._prefill_chars(prompt) * server.prompt_ms_per_char / 1000)
+                tokens = server._answer_tokens(prompt)
+                limit = (body.get("options") or {}).get("num_predict")
+                if limit: tokens = tokens[:limit]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                if not body.get("stream", True):
+                    time.sleep(len(tokens) * server.token_ms / 1000)
+                    server._count_tokens(len(tokens))
+                    self.wfile.write(json.dumps({"model": body.get("model"), "response": "".join(tokens), "done": True}).encode())
+                    return
+                try:
+                    for token in tokens:
+                        if self._client_gone(): return
+                        time.sleep(server.token_ms / 1000)
+                        server._count_tokens(1)
+                        self.wfile.write((json.dumps({"model": body.get("model"), "response": token, "done": False}) + "\n").encode())
+                        self.wfile.flush()
+                    self.wfile.write((json.dumps({"model": body.get("model"), "response": "", "done": True}) + "\n").encode())
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+        return Handler
+
+    def start(self) -> "StubOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _legacy_decision_prompt(name: str, description: str, location: str, current_time_str: str, status: str,
+                            plan_activity: str, observation: str, memories: List[str]) -> str:
+    """Tata letak prompt keputusan sebelum prompt_builder (waktu di awal, instruksi di akhir) sebagai pembanding."""
+    memories_str = "\n".join([f"- {m}" for m in memories])
+    context = f"""Anda adalah {name}. Identitas Anda: {description}.
+        Lokasi saat ini: {location}.
+        Waktu: {current_time_str}.
+        Status saat ini: {status}.
+        Rencana Anda untuk saat ini adalah: "{plan_activity}".
+        Anda baru saja mengamati: "{observation}".
+        Memori yang relevan dengan situasi ini:
+        {memories_str}
+        """
+    return f"""{context}
+
+    Tugas: Apa satu tindakan fisik dan spesifik yang Anda lakukan SEKARANG?
+    Gunakan format yang sangat ketat: `[NAMA LOKASI BARU] :: [DESKRIPSI AKSI SINGKAT]`
+    - Ubah NAMA LOKASI BARU hanya jika Anda pindah. Jika tidak, gunakan lokasi saat ini.
+    - DESKRIPSI AKSI SINGKAT harus berupa kalimat aktif (misal: "Memalu besi panas", bukan "Sedang memalu").
+
+    Contoh:
+    - Bengkel :: Memanaskan sebatang besi di tungku api.
+    - Balai Kota :: Berjalan menuju taman.
+    - Taman :: Duduk di bangku sambil membaca buku.
+
+    Tindakan Anda sekarang:
+    """
+
+
+def benchmark_time_to_decision(ticks: int = 10, n_agents: int = 4, n_memories: int = 200, token_ms: float = 15.0,
+                               prompt_ms_per_char: float = 0.05, verbose_tokens: int = 80) -> dict:
+    """
+    Waktu-ke-keputusan terhadap StubOllamaServer lokal untuk dua varian:
+    "legacy"  = tata letak prompt lama, tanpa num_predict, tanpa streaming
+    "current" = prompt_builder + num_predict + streaming yang berhenti begitu jawaban bisa di-parse
+    Setiap tick, setiap agen menilai satu peristiwa baru (skor kepentingan) lalu memutuskan tindakan.
+    """
+    locations = [f"Lokasi {i}" for i in range(3)]
+    install_stubs(locations)
+    env = build_environment(n_agents, n_memories, len(locations))
+    results = {}
+    for variant in ("legacy", "current"):
+        server = StubOllamaServer(prompt_ms_per_char=prompt_ms_per_char, token_ms=token_ms,
+                                  verbose_tokens=verbose_tokens).start()
+        client = OllamaClient(host=server.host, max_retries=0)
+        live = LiveBackend(client)
+        ollama_interface.set_backend(live)
+        ollama_interface.importance_cache = ollama_interface.ImportanceCache(path=None)
+        importance_times, decision_times = [], []
+        for tick in range(ticks):
+            now = env.current_time + timedelta(minutes=tick)
+            time_str = now.strftime("%H:%M")
+            for agent in env.agents:
+                event = f"{agent.name} melihat kejadian nomor {tick}."
+                started = time.perf_counter()
+                if variant == "legacy":
+                    live.generate(ollama_interface.MODEL_NAME, ollama_interface.importance_prompt(event), {'temperature': 0.0})
+                else:
+                    ollama_interface.get_importance_score(event)
+                importance_times.append(time.perf_counter() - started)
+
+                observation = env.get_observations_for(agent)
+                plan_activity = agent.current_plan_activity(time_str)
+                query = Agent.retrieval_query(time_str, plan_activity, observation)
+                memories = [m.description for m in agent.memory_stream.retrieve_memories(now, query, top_k=3)]
+                started = time.perf_counter()
+                if variant == "legacy":
+                    live.generate(ollama_interface.MODEL_NAME, _legacy_decision_prompt(
+                        agent.name, agent.description, agent.location, time_str, agent.status, plan_activity,
+                        observation, memories), {'temperature': 0.5})
+                else:
+                    ollama_interface.decide_next_action(decision_context(
+                        agent.name, agent.description, plan_activity, agent.location, agent.status,
+                        memories, observation, time_str, memory_token_budget=agent.memory_token_budget))
+                decision_times.append(time.perf_counter() - started)
+        results[variant] = {
+            "decision_mean_ms": 1000 * float(np.mean(decision_times)),
+            "decision_p95_ms": 1000 * float(np.percentile(decision_times, 95)),
+            "importance_mean_ms": 1000 * float(np.mean(importance_times)),
+            "prompt_chars_evaluated": server.prompt_chars_evaluated,
+            "tokens_generated": server.tokens_generated,
+            "early_stops": client.stats()["early_stops"],
+        }
+        client.close()
+        server.stop()
+        print(f"{variant:<8} decide={results[variant]['decision_mean_ms']:8.1f} ms  "
+              f"importance={results[variant]['importance_mean_ms']:7.1f} ms  "
+              f"prompt_chars={server.prompt_chars_evaluated:<8} tokens={server.tokens_generated}")
+    env.shutdown()
+    return {"ticks": ticks, "agents": n_agents, "token_ms": token_ms, "prompt_ms_per_char": prompt_ms_per_char,
+            "verbose_tokens": verbose_tokens, "variants": results}
+
+
+def benchmark_event_ingestion(n_agents: int = 100, n_events: int = 200, unique_descriptions: int = 50,
+                              llm_latency: float = 0.005) -> dict:
+    """
+    Throughput event eksternal ke dunia n_agents agen (setiap event ke semua agen):
+    "per_agent" = agent.observe() per agen per event (jalur /event lama)
+    "bulk"      = Environment.prepare_events (sekali per teks unik) + deliver_events (jalur /events)
+    Refleksi dimatikan (ambang tak hingga) agar yang terukur hanya jalur ingest.
+    """
+    locations = [f"Lokasi {i}" for i in range(5)]
+    events = [{"description": f"kejadian nomor {i % unique_descriptions} di alun-alun."} for i in range(n_events)]
+    results = {}
+    for variant in ("per_agent", "bulk"):
+        backend = install_stubs(locations, llm_latency)
+        env = build_environment(n_agents, 0, len(locations))
+        for agent in env.agents: agent.reflection_threshold = float("inf")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter()
+            if variant == "per_agent":
+                for event in events:
+                    for agent in env.agents:
+                        agent.observe(f"Sebuah peristiwa tak terduga terjadi: {event['description']}")
+            else:
+                env.deliver_events(env.prepare_events(events))
+            elapsed = time.perf_counter() - started
+        results[variant] = {
+            "seconds": elapsed,
+            "events_per_s": n_events / elapsed,
+            "deliveries_per_s": n_events * n_agents / elapsed,
+            "llm_calls": backend.calls,
+            "embedding_lookups": simulation_core.embedding_service.stats()["hits"] + simulation_core.embedding_service.stats()["misses"],
+            "memories": sum(len(agent.memory_stream) for agent in env.agents),
+        }
+        env.shutdown()
+        print(f"{variant:<10} events/s={results[variant]['events_per_s']:10.1f}  deliveries/s={results[variant]['deliveries_per_s']:10.0f}  "
+              f"llm={backend.calls:<5} embedding_lookups={results[variant]['embedding_lookups']}")
+    return {"agents": n_agents, "events": n_events, "unique_descriptions": unique_descriptions,
+            "llm_latency_s": llm_latency, "variants": results}
+
+
+def _importance_requests() -> Dict[str, float]:
+    return {kind: metrics.llm_requests.labels(kind, "ok").value for kind in ("importance", "importance_batch")}
+
+
+def benchmark_importance_batching(n_agents: int = 20, n_locations: int = 5, ticks: int = 10, llm_latency: float = 0.005,
+                                  llm_stay: float = 0.5, step_mode: str = "sequential",
+                                  batch_malformed: float = 0.02, batch_drift: float = 0.05) -> dict:
+    """
+    Permintaan LLM penilaian kepentingan per tick dengan dan tanpa Environment(batch_importance=True),
+    serta kesesuaian skor jalur massal dengan jalur satu-per-satu untuk observasi yang sama.
+    Backend tiruan menjawab sebagian item prompt bernomor dengan rusak (batch_malformed, memicu fallback)
+    atau meleset satu poin (batch_drift), meniru model yang kurang teliti pada daftar panjang.
+    """
+    locations = [f"Lokasi {i}" for i in range(n_locations)]
+    results = {}
+    batched_scores: Dict[str, int] = {}
+    for variant, batch_importance in (("single", False), ("batched", True)):
+        backend = install_stubs(locations, llm_latency, llm_stay)
+        backend.batch_malformed, backend.batch_drift = batch_malformed, batch_drift
+        env = build_environment(n_agents, 0, n_locations, step_mode=step_mode, batch_importance=batch_importance)
+        for agent in env.agents: agent.reflection_threshold = float("inf")
+        original = simulation_core.get_importance_scores
+
+        def recording(texts):
+            scores = original(texts)
+            batched_scores.update(zip(texts, scores))
+            return scores
+
+        simulation_core.get_importance_scores = recording
+        before, fallbacks_before = _importance_requests(), metrics.importance_batch_fallbacks.value
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            try:
+                started = time.perf_counter()
+                for _ in range(ticks):
+                    env.run_step()
+                elapsed = time.perf_counter() - started
+            finally:
+                simulation_core.get_importance_scores = original
+                env.shutdown()
+        requests = {kind: value - before[kind] for kind, value in _importance_requests().items()}
+        results[variant] = {
+            "seconds": elapsed,
+            "importance_requests": requests,
+            "importance_requests_per_tick": sum(requests.values()) / ticks,
+            "batch_fallbacks": metrics.importance_batch_fallbacks.value - fallbacks_before,
+            "llm_calls": backend.calls,
+        }
+        print(f"{variant:<8} importance requests/tick={results[variant]['importance_requests_per_tick']:6.2f}  "
+              f"(single={requests['importance']:.0f} batch={requests['importance_batch']:.0f})  "
+              f"fallbacks={results[variant]['batch_fallbacks']:.0f}  seconds={elapsed:.2f}")
+
+    # Jalur satu-per-satu (tanpa cache) untuk setiap observasi yang dinilai lewat jalur massal
+    single_scores = {text: ollama_interface._score_uncached(text) for text in batched_scores}
+    diffs = np.array([abs(batched_scores[text] - single_scores[text]) for text in batched_scores])
+    agreement = {
+        "observations": len(diffs),
+        "exact": float(np.mean(diffs == 0)) if len(diffs) else 1.0,
+        "within_1": float(np.mean(diffs <= 1)) if len(diffs) else 1.0,
+        "mean_abs_diff": float(np.mean(diffs)) if len(diffs) else 0.0,
+    }
+    reduction = 1 - results["batched"]["importance_requests_per_tick"] / results["single"]["importance_requests_per_tick"]
+    print(f"pengurangan permintaan/tick={reduction:.1%}  kesesuaian skor: persis={agreement['exact']:.1%} "
+          f"selisih<=1={agreement['within_1']:.1%} ({agreement['observations']} observasi)")
+    return {"agents": n_agents, "locations": n_locations, "ticks": ticks, "step_mode": step_mode,
+            "llm_latency_s": llm_latency, "llm_stay_probability": llm_stay,
+            "batch_malformed": batch_malformed, "batch_drift": batch_drift,
+            "variants": results, "requests_per_tick_reduction": reduction, "score_agreement": agreement}
+
+
+def benchmark_ann_retrieval(sizes: Sequence[int] = (2000, 10000, 100000), probes: Sequence[int] = (1, 2, 4, 8, 16, 32),
+                            queries: int = 200, top_k: int = 10, topics: int = 500, noise: float = 1.0, dim: int = 384,
+                            seed: int = 0) -> List[dict]:
+    """
+    recall@k dan latensi retrieval berbasis indeks IVF (MemoryStream(ann=True)) dibanding scan penuh.
+    Embedding sintetis berkelompok per topik (seperti embedding kalimat sungguhan, tidak seperti
+    HashEmbeddingBackend yang acak seragam); query = topik acak + derau. recall@k = irisan top-k ANN
+    dan top-k eksak dibagi k, dengan skor lengkap (relevansi + importance + recency) di kedua jalur.
+    Aliran di bawah ann_min_size tidak membangun indeks, jadi selalu eksak.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    now = datetime(2025, 1, 1, 12, 0)
+    results = []
+    for n in sizes:
+        embeddings = centers[rng.integers(topics, size=n)] + noise * rng.standard_normal((n, dim), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        # Satu memori per menit sampai "sekarang"
+        timestamps = simulation_core._to_micros(now) - np.arange(n, 0, -1, dtype=np.int64) * 60_000_000
+        stream = MemoryStream(ann=True)
+        started = time.perf_counter()
+        stream.extend_columns(embeddings, timestamps, rng.integers(1, 11, size=n).astype(np.float32),
+                              np.arange(n, dtype=np.int64), np.zeros(n, dtype=bool), [f"memori {i}" for i in range(n)])
+        # Indeks dibangun di thread latar; append_s = waktu di jalur tulis, build_s = sampai indeks terpasang
+        append_s = time.perf_counter() - started
+        stream.wait_for_ann()
+        build_s = time.perf_counter() - started
+        query_vectors = centers[rng.integers(topics, size=queries)] + noise * rng.standard_normal((queries, dim), dtype=np.float32)
+
+        def run(exact: bool):
+            latencies, results_ = [], []
+            for q in query_vectors:
+                started = time.perf_counter()
+                memories = stream.retrieve_by_embedding(now, q, top_k, exact=exact)
+                latencies.append(time.perf_counter() - started)
+                results_.append({m.description for m in memories})
+            return np.array(latencies) * 1000, results_
+
+        exact_ms, exact_sets = run(exact=True)
+        entry = {"memories": n, "append_s": append_s, "build_s": build_s, "index": stream.ann_stats(),
+                 "exact": {"mean_ms": float(exact_ms.mean()), "p95_ms": float(np.percentile(exact_ms, 95))}, "ann": []}
+        print(f"n={n:<7} eksak mean={exact_ms.mean():8.3f} ms  indeks={'ya' if entry['index'] else 'tidak (aliran kecil)'}"
+              f"  append={append_s:.2f} s  build={build_s:.2f} s")
+        for n_probe in (probes if entry["index"] else ()):
+            stream.ann_probe = n_probe
+            ann_ms, ann_sets = run(exact=False)
+            recall = float(np.mean([len(a & e) / len(e) for a, e in zip(ann_sets, exact_sets)]))
+            entry["ann"].append({"n_probe": n_probe, "recall_at_k": recall, "mean_ms": float(ann_ms.mean()),
+                                 "p95_ms": float(np.percentile(ann_ms, 95)), "speedup": float(exact_ms.mean() / ann_ms.mean())})
+            print(f"    n_probe={n_probe:<3} recall@{top_k}={recall:6.3f}  mean={ann_ms.mean():8.3f} ms  "
+                  f"p95={np.percentile(ann_ms, 95):8.3f} ms  speedup={exact_ms.mean() / ann_ms.mean():6.1f}x")
+        stream.close()
+        results.append(entry)
+    return results
+
+
+def _metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark skala simulasi agen generatif (backend tiruan).")
+    parser.add_argument("--agents", type=_int_list, default=[2, 20, 100])
+    parser.add_argument("--memories", type=_int_list, default=[0, 1000, 10000])
+    parser.add_argument("--locations", type=_int_list, default=[5])
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--step-mode", choices=Environment.STEP_MODES, default="sequential")
+    parser.add_argument("--reflection-mode", choices=Environment.REFLECTION_MODES, default="inline")
+    parser.add_argument("--scheduler", choices=simulation_core.TickScheduler.MODES, default="every_tick")
+    parser.add_argument("--embedding-dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--ram-budget-mb", type=float, default=None, help="anggaran RAM memori per agen (sisanya ke tingkat dingin)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="latensi sintetis per panggilan LLM (detik)")
+    parser.add_argument("--llm-stay", type=float, default=0.0,
+                        help="peluang keputusan tiruan berupa tetap di lokasi/status sekarang (0..1)")
+    parser.add_argument("--no-isolate", action="store_true", help="jalankan semua konfigurasi di proses ini")
+    parser.add_argument("--embedding-backends", default=None,
+                        help="daftar backend embedding (mis. hash,torch,onnx,onnx-quantized); hanya ukur cold start & encode")
+    parser.add_argument("--time-to-decision", action="store_true",
+                        help="ukur waktu-ke-keputusan terhadap server Ollama tiruan (prompt lama vs prompt_builder + streaming)")
+    parser.add_argument("--event-ingestion", action="store_true",
+                        help="ukur throughput event eksternal untuk 100 agen (observe per agen vs /events massal)")
+    parser.add_argument("--no-batch-importance", action="store_true",
+                        help="nilai observasi satu per satu, juga di mode concurrent (default: massal hanya di concurrent)")
+    parser.add_argument("--importance-batching", action="store_true",
+                        help="ukur permintaan penilaian kepentingan per tick (satu per satu vs massal) dan kesesuaian skornya")
+    parser.add_argument("--ann-retrieval", action="store_true",
+                        help="ukur recall@k vs latensi retrieval indeks IVF dibanding scan penuh (embedding sintetis berkelompok)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    if args.embedding_backends:
+        results = benchmark_embedding_backends(args.embedding_backends.split(","))
+        with open(args.output, "w") as f:
+            json.dump({"meta": _metadata(), "embedding_backends": results}, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+        return
+
+    if args.event_ingestion:
+        result = benchmark_event_ingestion(llm_latency=args.llm_latency)
+        with open(args.output, "w") as f:
+            json.dump({"meta": _metadata(), "event_ingestion": result}, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+        return
+
+    if args.ann_retrieval:
+        result = benchmark_ann_retrieval()
+        with open(args.output, "w") as f:
+            json.dump({"meta": _metadata(), "ann_retrieval": result}, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+        return
+
+    if args.importance_batching:
+        # Mode sequential: observasi yang berubah karena agen sebelumnya berpindah dinilai satu per satu
+        result = [benchmark_importance_batching(llm_latency=args.llm_latency, step_mode=mode) for mode in Environment.STEP_MODES]
+        with open(args.output, "w") as f:
+            json.dump({"meta": _metadata(), "importance_batching": result}, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+        return
+
+    if args.time_to_decision:
+        result = benchmark_time_to_decision()
+        with open(args.output, "w") as f:
+            json.dump({"meta": _metadata(), "time_to_decision": result}, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+        return
+
+    results = []
+    for n_agents, n_memories, n_locations in itertools.product(args.agents, args.memories, args.locations):
+        kwargs = dict(n_agents=n_agents, n_memories=n_memories, n_locations=n_locations, steps=args.steps,
+                      llm_latency=args.llm_latency, step_mode=args.step_mode,
+                      embedding_dtype=args.embedding_dtype, ram_budget_mb=args.ram_budget_mb,
+                      reflection_mode=args.reflection_mode, scheduler=args.scheduler, llm_stay=args.llm_stay,
+                      batch_importance=False if args.no_batch_importance else None)
+        result = run_config(**kwargs) if args.no_isolate else run_isolated(**kwargs)
+        results.append(result)
+        print(f"agents={n_agents:<5} memories={n_memories:<7} locations={n_locations:<4} "
+              f"step={result['step_mean_ms']:9.2f} ms  steps/s={result['steps_per_s']:8.2f}  "
+              f"llm={result['llm_calls']:<6} skipped={result['scheduler']['skipped']:<6} "
+              f"retrieve p50={result['phases'].get('retrieve', {}).get('p50_ms', 0):7.3f} ms  "
+              f"rss={result['peak_rss_mb']:.0f} MB")
+
+    with open(args.output, "w") as f:
+        json.dump({"meta": _metadata(), "results": results}, f, indent=2)
+    print(f"Hasil disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# file: checkpoint.py
+"""
+Checkpoint/restore seluruh Environment tanpa panggilan LLM atau embedding.
+
+Struktur direktori:
+    manifest.json                        jam simulasi, agen (lokasi, status, rencana, ...), daftar segmen
+    agents/<dir>/seg-<awal>-<akhir>.npy  embedding (bisa di-memory-map saat restore)
+    agents/<dir>/seg-<awal>-<akhir>.npz  timestamp, importance, urutan, flag refleksi
+    agents/<dir>/seg-<awal>-<akhir>.json deskripsi memori
+
+Checkpoint bersifat inkremental: untuk aliran memori yang sama (stream_id), hanya memori dengan
+urutan >= akhir segmen terakhir yang ditulis sebagai segmen baru. Snapshot penuh (aliran baru, atau
+pemadatan setelah COMPACT_AFTER_SEGMENTS segmen) selalu ditulis ke direktori agen yang baru.
+manifest.json ditulis paling akhir secara atomik dan baru setelah itu direktori/segmen yang tidak
+lagi dirujuk dihapus, jadi checkpoint yang terputus di tengah tidak merusak checkpoint sebelumnya.
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from simulation_core import Agent, Environment, MemoryStream
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+# Jumlah segmen inkremental per agen sebelum digabung menjadi satu snapshot penuh
+COMPACT_AFTER_SEGMENTS = 16
+
+
+def _read_manifest(path: str) -> Optional[dict]:
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def has_checkpoint(path: str) -> bool:
+    return os.path.exists(os.path.join(path, MANIFEST))
+
+
+def _write_segment(agent_dir: str, columns: dict) -> dict:
+    start, end = int(columns["seq"][0]), int(columns["seq"][-1]) + 1
+    name = f"seg-{start:012d}-{end:012d}"
+    base = os.path.join(agent_dir, name)
+    np.save(base + ".npy", np.ascontiguousarray(columns["embeddings"]))
+    np.savez(base + ".npz", timestamps=columns["timestamps"], importances=columns["importances"],
+             seq=columns["seq"], is_reflection=columns["is_reflection"])
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(columns["descriptions"], f, ensure_ascii=False)
+    return {"name": name, "start": start, "end": end, "count": len(columns["seq"])}
+
+
+def _remove_unreferenced(agents_root: str, agents: list):
+    """Menghapus direktori agen dan file segmen yang tidak dirujuk manifest (sisa snapshot lama/terputus)."""
+    referenced = {a["dir"]: {s["name"] for s in a["memory"]["segments"]} for a in agents}
+    for dir_name in os.listdir(agents_root):
+        agent_dir = os.path.join(agents_root, dir_name)
+        if dir_name not in referenced:
+            shutil.rmtree(agent_dir, ignore_errors=True)
+            continue
+        for file_name in os.listdir(agent_dir):
+            if os.path.splitext(file_name)[0] not in referenced[dir_name]:
+                os.remove(os.path.join(agent_dir, file_name))
+
+
+def save_checkpoint(env: Environment, path: str) -> dict:
+    """Menyimpan Environment ke `path`. Mengembalikan ringkasan (memori yang ditulis, durasi)."""
+    started = time.perf_counter()
+    os.makedirs(path, exist_ok=True)
+    previous = _read_manifest(path) or {"agents": []}
+    previous_agents = {a["name"]: a for a in previous["agents"]}
+    agents_root = os.path.join(path, "agents")
+    written = 0
+    agents = []
+    for i, agent in enumerate(env.agents):
+        stream = agent.memory_stream
+        entry = previous_agents.get(agent.name)
+        if (entry is None or entry["memory"]["stream_id"] != stream.stream_id
+                or len(entry["memory"]["segments"]) >= COMPACT_AFTER_SEGMENTS):
+            # Aliran baru/berbeda atau terlalu banyak segmen: snapshot penuh di direktori baru;
+            # direktori lama tetap utuh sampai manifest baru terpasang
+            dir_name = f"{i}-{uuid.uuid4().hex[:8]}"
+            segments, seq_start = [], 0
+        else:
+            dir_name = entry["dir"]
+            segments = list(entry["memory"]["segments"])
+            seq_start = segments[-1]["end"] if segments else 0
+        agent_dir = os.path.join(agents_root, dir_name)
+        os.makedirs(agent_dir, exist_ok=True)
+        if stream.next_seq > seq_start:
+            columns = stream.export_since(seq_start)
+            if len(columns["seq"]):
+                segments.append(_write_segment(agent_dir, columns))
+                written += len(columns["seq"])
+        agents.append({
+            "name": agent.name,
+            "dir": dir_name,
+            "description": agent.description,
+            "location": agent.location,
+            "status": agent.status,
+            "daily_plan": agent.daily_plan,
+            "cumulative_importance_since_reflection": agent.cumulative_importance_since_reflection,
+            "reflection_threshold": agent.reflection_threshold,
+            "memory": {
+                "stream_id": stream.stream_id,
+                "next_seq": stream.next_seq,
+                "embedding_dtype": stream.embedding_dtype.name,
+                "ram_budget_mb": stream.ram_budget_mb,
+                "ann": stream.ann,
+                "ann_probe": stream.ann_probe,
+                "ann_min_size": stream.ann_min_size,
+                "ann_background": stream.ann_background,
+                "segments": segments,
+            },
+        })
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "saved_at": datetime.now().isoformat(),
+        "start_time": env.start_time.isoformat(),
+        "current_time": env.current_time.isoformat(),
+        "step_mode": env.step_mode,
+        "max_workers": env.max_workers,
+        "reflection_mode": env.reflection_mode,
+        "scheduler": env.scheduler.mode,
+        "max_idle_minutes": int(env.scheduler.max_idle.total_seconds() // 60),
+        "batch_importance": env.batch_importance,
+        "agents": agents,
+    }
+    tmp_path = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+    _remove_unreferenced(agents_root, agents)
+    return {"memories_written": written, "agents": len(agents), "seconds": time.perf_counter() - started}
+
+
+def load_checkpoint(path: str, cold_dir: Optional[str] = None) -> Environment:
+    """Membangun kembali Environment dari checkpoint tanpa memanggil LLM atau model embedding."""
+    manifest = _read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"Tidak ada checkpoint di '{path}'")
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Versi format checkpoint tidak didukung: {manifest.get('format_version')}")
+    env = Environment(step_mode=manifest["step_mode"], max_workers=manifest["max_workers"],
+                      reflection_mode=manifest.get("reflection_mode", "inline"),
+                      scheduler=manifest.get("scheduler", "every_tick"), max_idle_minutes=manifest.get("max_idle_minutes", 15),
+                      batch_importance=manifest.get("batch_importance"))
+    env.start_time = datetime.fromisoformat(manifest["start_time"])
+    env.current_time = datetime.fromisoformat(manifest["current_time"])
+    for entry in manifest["agents"]:
+        memory = entry["memory"]
+        stream = MemoryStream(embedding_dtype=memory["embedding_dtype"], ram_budget_mb=memory["ram_budget_mb"], cold_dir=cold_dir,
+                              ann=memory.get("ann", False), ann_probe=memory.get("ann_probe", 8),
+                              ann_min_size=memory.get("ann_min_size", 5000), ann_background=memory.get("ann_background", True))
+        stream.stream_id = memory["stream_id"]
+        agent_dir = os.path.join(path, "agents", entry["dir"])
+        for segment in memory["segments"]:
+            base = os.path.join(agent_dir, segment["name"])
+            embeddings = np.load(base + ".npy", mmap_mode="r")
+            with np.load(base + ".npz") as columns:
+                with open(base + ".json", encoding="utf-8") as f:
+                    descriptions = json.load(f)
+                stream.extend_columns(embeddings, columns["timestamps"], columns["importances"],
+                                      columns["seq"], columns["is_reflection"], descriptions)
+        agent = Agent(name=entry["name"], description=entry["description"], location=entry["location"], memory_stream=stream)
+        agent.status = entry["status"]
+        agent.daily_plan = entry["daily_plan"]
+        agent.cumulative_importance_since_reflection = entry["cumulative_importance_since_reflection"]
+        agent.reflection_threshold = entry["reflection_threshold"]
+        env.add_agent(agent)
+    return env
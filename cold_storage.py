@@ -0,0 +1,75 @@
+# file: cold_storage.py
+
+import os
+import tempfile
+import weakref
+from typing import List, Optional
+
+import numpy as np
+
+
+def _remove_if_exists(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class ColdMemoryTier:
+    """
+    Tingkat "dingin" MemoryStream: embedding memori lama yang jarang penting disimpan di file
+    memory-mapped (np.memmap) sehingga tidak memakan RAM, tetapi tetap bisa ikut di-scan saat
+    retrieval. Kolom kecil (timestamp, importance, urutan, deskripsi) tetap di RAM.
+    """
+    _INITIAL_CAPACITY = 1024
+
+    def __init__(self, dim: int, dtype=np.float32, directory: Optional[str] = None):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        fd, self.path = tempfile.mkstemp(prefix="cold_memories_", suffix=".f%d" % (8 * self.dtype.itemsize), dir=directory)
+        os.close(fd)
+        # Cadangan jika close() tidak pernah dipanggil: file dihapus saat objek dibuang atau proses keluar
+        self._remove_file = weakref.finalize(self, _remove_if_exists, self.path)
+        self.size = 0
+        self._capacity = 0
+        self.embeddings: Optional[np.memmap] = None
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.importances = np.empty(0, dtype=np.float32)
+        self.seq = np.empty(0, dtype=np.int64)
+        self.is_reflection = np.empty(0, dtype=bool)
+        self.descriptions: List[str] = []
+
+    def _grow(self, needed: int):
+        if needed <= self._capacity: return
+        new_capacity = max(self._INITIAL_CAPACITY, self._capacity)
+        while new_capacity < needed: new_capacity *= 2
+        if self.embeddings is not None:
+            self.embeddings.flush()
+            self.embeddings = None
+        with open(self.path, "r+b") as f:
+            f.truncate(new_capacity * self.dim * self.dtype.itemsize)
+        self.embeddings = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(new_capacity, self.dim))
+        for attr in ("timestamps", "importances", "seq", "is_reflection"):
+            old = getattr(self, attr)
+            grown = np.empty(new_capacity, dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, attr, grown)
+        self._capacity = new_capacity
+
+    def append(self, embeddings: np.ndarray, timestamps: np.ndarray, importances: np.ndarray,
+               seq: np.ndarray, is_reflection: np.ndarray, descriptions: List[str]):
+        count = len(seq)
+        self._grow(self.size + count)
+        end = self.size + count
+        self.embeddings[self.size:end] = embeddings
+        self.timestamps[self.size:end] = timestamps
+        self.importances[self.size:end] = importances
+        self.seq[self.size:end] = seq
+        self.is_reflection[self.size:end] = is_reflection
+        self.descriptions.extend(descriptions)
+        self.size = end
+
+    def nbytes_on_disk(self) -> int:
+        return self._capacity * self.dim * self.dtype.itemsize
+
+    def close(self):
+        self.embeddings = None
+        self._remove_file()
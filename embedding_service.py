@@ -0,0 +1,217 @@
+# file: embedding_service.py
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+import metrics
+
+
+class SentenceTransformerBackend:
+    """
+    Encoder sentence-transformers yang baru dimuat saat pertama kali dipakai (atau lewat warm_up),
+    sehingga `import simulation_core` tidak lagi menunggu torch dan model dimuat.
+    st_backend="onnx" memakai ONNX Runtime di CPU; model_kwargs={"file_name": ...} memilih
+    varian ONNX terkuantisasi dari repositori model.
+    """
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', st_backend: str = "torch", model_kwargs: Optional[dict] = None):
+        self.model_name = model_name
+        self.st_backend = st_backend
+        self.model_kwargs = model_kwargs
+        self.name = st_backend if not model_kwargs else f"{st_backend}-quantized"
+        self._model = None
+        self._lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+        self.load_seconds: Optional[float] = None
+        self.encode_calls = 0
+        self.encoded_texts = 0
+        self.encode_seconds = 0.0
+
+    @property
+    def loaded(self) -> bool: return self._model is not None
+
+    def load(self):
+        if self._model is not None: return self._model
+        with self._lock:
+            if self._model is None:
+                print(f"Memuat model embedding ({self.model_name}, {self.name})...")
+                started = time.perf_counter()
+                from sentence_transformers import SentenceTransformer
+                kwargs = {}
+                if self.st_backend != "torch": kwargs["backend"] = self.st_backend
+                if self.model_kwargs: kwargs["model_kwargs"] = self.model_kwargs
+                self._model = SentenceTransformer(self.model_name, **kwargs)
+                self.load_seconds = time.perf_counter() - started
+                print(f"Model embedding berhasil dimuat dalam {self.load_seconds:.1f} detik.")
+        return self._model
+
+    def warm_up(self, background: bool = True):
+        """Memuat model sekarang; dengan background=True pemuatan berjalan di thread terpisah."""
+        if not background:
+            self.load(); return
+        if self._warmup_thread is None and self._model is None:
+            self._warmup_thread = threading.Thread(target=self.load, name="embedding-warmup", daemon=True)
+            self._warmup_thread.start()
+
+    def encode(self, texts, **kwargs):
+        model = self.load()
+        started = time.perf_counter()
+        result = model.encode(texts, **kwargs)
+        self.encode_seconds += time.perf_counter() - started
+        self.encode_calls += 1
+        self.encoded_texts += 1 if isinstance(texts, str) else len(texts)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name, "model": self.model_name, "loaded": self.loaded,
+            "cold_start_s": self.load_seconds, "encode_calls": self.encode_calls,
+            "encode_ms_per_call": 1000 * self.encode_seconds / self.encode_calls if self.encode_calls else 0.0,
+            "encode_ms_per_text": 1000 * self.encode_seconds / self.encoded_texts if self.encoded_texts else 0.0,
+        }
+
+
+class HashEmbeddingBackend:
+    """Embedding deterministik dari hash teks, tanpa model. Untuk tes, benchmark, dan mode offline."""
+    name = "hash"
+    loaded = True
+    load_seconds = 0.0
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.encode_calls = 0
+        self.encoded_texts = 0
+        self.encode_seconds = 0.0
+
+    def _one(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+    def load(self): return self
+
+    def warm_up(self, background: bool = True): pass
+
+    def encode(self, texts, **kwargs):
+        started = time.perf_counter()
+        if isinstance(texts, str):
+            result = self._one(texts)
+        else:
+            result = np.stack([self._one(t) for t in texts]) if len(texts) else np.empty((0, self.dim), dtype=np.float32)
+        self.encode_seconds += time.perf_counter() - started
+        self.encode_calls += 1
+        self.encoded_texts += 1 if isinstance(texts, str) else len(texts)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name, "loaded": True, "cold_start_s": 0.0, "encode_calls": self.encode_calls,
+            "encode_ms_per_call": 1000 * self.encode_seconds / self.encode_calls if self.encode_calls else 0.0,
+            "encode_ms_per_text": 1000 * self.encode_seconds / self.encoded_texts if self.encoded_texts else 0.0,
+        }
+
+
+# Varian ONNX terkuantisasi (int8) yang tersedia di repositori all-MiniLM-L6-v2
+QUANTIZED_ONNX_FILE = "onnx/model_quint8_avx2.onnx"
+
+def create_embedding_backend(name: str, model_name: str = 'all-MiniLM-L6-v2'):
+    """name: "torch" (default), "onnx", "onnx-quantized", atau "hash"."""
+    if name == "torch":
+        return SentenceTransformerBackend(model_name)
+    if name == "onnx":
+        return SentenceTransformerBackend(model_name, st_backend="onnx")
+    if name == "onnx-quantized":
+        return SentenceTransformerBackend(model_name, st_backend="onnx", model_kwargs={"file_name": QUANTIZED_ONNX_FILE})
+    if name == "hash":
+        return HashEmbeddingBackend()
+    raise ValueError(f"Backend embedding tidak dikenal: '{name}' (pilih torch, onnx, onnx-quantized, atau hash)")
+
+def embedding_backend_from_env():
+    """EMBEDDING_BACKEND (default torch) dan EMBEDDING_MODEL (default all-MiniLM-L6-v2)."""
+    return create_embedding_backend(os.environ.get("EMBEDDING_BACKEND", "torch"),
+                                    os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+
+
+class EmbeddingService:
+    """
+    Lapisan di depan model embedding: cache LRU berbasis teks yang dipakai bersama
+    oleh semua agen, plus batching agar banyak teks di-encode dalam satu panggilan.
+    """
+    def __init__(self, model, cache_size: int = 10000):
+        self.model = model
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.encoded_texts = 0
+
+    def _lookup(self, text: str):
+        embedding = self._cache.get(text)
+        if embedding is not None:
+            self._cache.move_to_end(text)
+        return embedding
+
+    def _store(self, text: str, embedding: np.ndarray):
+        embedding.setflags(write=False)  # dipakai bersama, jangan sampai diubah di tempat
+        self._cache[text] = embedding
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def encode_many(self, texts: Iterable[str]) -> List[np.ndarray]:
+        """Mengembalikan embedding untuk setiap teks; semua cache miss di-encode dalam satu batch."""
+        texts = list(texts)
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        missing_set = set()
+        with self._lock:
+            for text in texts:
+                if text in found or text in missing_set: continue
+                embedding = self._lookup(text)
+                if embedding is None:
+                    missing.append(text); missing_set.add(text)
+                else:
+                    found[text] = embedding
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        metrics.embedding_cache_lookups.labels("hit").inc(len(texts) - len(missing))
+        metrics.embedding_cache_lookups.labels("miss").inc(len(missing))
+        if missing:
+            with metrics.span("embed", metrics.embedding_seconds, texts=len(missing)):
+                encoded = np.asarray(self.model.encode(missing), dtype=np.float32)
+            metrics.embedding_texts.inc(len(missing))
+            with self._lock:
+                self.batches += 1
+                self.encoded_texts += len(missing)
+                for text, embedding in zip(missing, encoded):
+                    embedding = np.array(embedding)  # salin agar tidak menahan seluruh matriks batch
+                    found[text] = embedding
+                    self._store(text, embedding)
+        return [found[text] for text in texts]
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.encode_many([text])[0]
+
+    def prefetch(self, texts: Iterable[str]):
+        """Memanaskan cache untuk teks yang akan dibutuhkan, dalam satu panggilan encode."""
+        self.encode_many(texts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            result = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "batches": self.batches,
+                "encoded_texts": self.encoded_texts,
+                "cache_size": len(self._cache),
+            }
+        if hasattr(self.model, "stats"):
+            result["backend"] = self.model.stats()
+        return result
@@ -0,0 +1,172 @@
+# file: importance_cache.py
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Normalisasi sederhana agar variasi spasi tidak menghasilkan entri cache berbeda."""
+    return " ".join(text.split())
+
+
+class ImportanceCache:
+    """
+    Memoisasi dua tingkat untuk skor kepentingan: LRU di memori proses di depan
+    penyimpanan SQLite di disk. Kunci = (teks ternormalisasi, nama model, versi prompt),
+    sehingga mengganti model atau prompt otomatis tidak memakai skor lama.
+
+    File SQLite bisa dipakai bersama beberapa proses (api_server + pekerja WorldPool): koneksi memakai
+    mode WAL dan menunggu hingga busy_timeout detik saat database terkunci. Tingkat disk bersifat
+    best-effort; kesalahan SQLite dicatat dan diperlakukan sebagai miss (get) atau dilewati (put).
+    File baru dibuka pada get/put pertama (bukan saat impor); jika gagal dibuka, cache berjalan
+    hanya di memori dan pembukaan dicoba lagi setelah _REOPEN_DELAY detik.
+    """
+    _REOPEN_DELAY = 60.0
+
+    def __init__(self, path: Optional[str] = "importance_cache.sqlite3", memory_size: int = 5000,
+                 disk_max_entries: int = 200000, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.memory_size = memory_size
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[Tuple[str, str, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._reopen_at = 0.0
+        self._disk_entries = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        self.disk_errors = 0
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        """Koneksi SQLite, dibuka saat pertama dibutuhkan. Dipanggil dengan _lock dipegang."""
+        if self._conn is not None or not self.path or time.monotonic() < self._reopen_at:
+            return self._conn
+        try:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        except sqlite3.Error as e:
+            self._disk_failed("membuka", e)
+            return None
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS importance (
+                text TEXT NOT NULL, model TEXT NOT NULL, prompt_version TEXT NOT NULL,
+                score INTEGER NOT NULL, last_used REAL NOT NULL,
+                PRIMARY KEY (text, model, prompt_version))""")
+            conn.execute("CREATE INDEX IF NOT EXISTS importance_last_used ON importance(last_used)")
+            conn.commit()
+            self._disk_entries = conn.execute("SELECT COUNT(*) FROM importance").fetchone()[0]
+        except sqlite3.Error as e:
+            conn.close()
+            self._disk_failed("membuka", e)
+            return None
+        self._conn = conn
+        return conn
+
+    def _remember(self, key: Tuple[str, str, str], score: int):
+        self._memory[key] = score
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.memory_evictions += 1
+
+    def get(self, text: str, model: str, prompt_version: str) -> Optional[int]:
+        key = (normalize_text(text), model, prompt_version)
+        with self._lock:
+            score = self._memory.get(key)
+            if score is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return score
+            if self._disk() is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT score FROM importance WHERE text=? AND model=? AND prompt_version=?", key).fetchone()
+                    if row is not None:
+                        # Perbarui last_used hanya saat naik ke tingkat memori, bukan di setiap hit
+                        self._conn.execute(
+                            "UPDATE importance SET last_used=? WHERE text=? AND model=? AND prompt_version=?",
+                            (time.time(),) + key)
+                        self._conn.commit()
+                except sqlite3.Error as e:
+                    self._disk_failed("membaca", e)
+                    row = None
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def _disk_failed(self, action: str, error: Exception):
+        """Dipanggil dengan _lock dipegang."""
+        self.disk_errors += 1
+        print(f"Warning: gagal {action} cache skor kepentingan di '{self.path}': {error}. Melanjutkan tanpa disk.")
+        if self._conn is None:
+            self._reopen_at = time.monotonic() + self._REOPEN_DELAY
+            return
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def put(self, text: str, model: str, prompt_version: str, score: int):
+        key = (normalize_text(text), model, prompt_version)
+        with self._lock:
+            self._remember(key, score)
+            self.stores += 1
+            if self._disk() is None: return
+            try:
+                self._put_disk(key, score)
+            except sqlite3.Error as e:
+                self._disk_failed("menulis", e)
+
+    def _put_disk(self, key: Tuple[str, str, str], score: int):
+        """Dipanggil dengan _lock dipegang."""
+        now = time.time()
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO importance (text, model, prompt_version, score, last_used) VALUES (?, ?, ?, ?, ?)",
+            key + (score, now))
+        if cursor.rowcount:
+            self._disk_entries += 1
+        else:
+            self._conn.execute(
+                "UPDATE importance SET score=?, last_used=? WHERE text=? AND model=? AND prompt_version=?",
+                (score, now) + key)
+        if self._disk_entries > self.disk_max_entries:
+            # Buang sekitar 10% entri yang paling lama tidak dipakai sekaligus
+            excess = self._disk_entries - int(self.disk_max_entries * 0.9)
+            self._conn.execute(
+                "DELETE FROM importance WHERE rowid IN (SELECT rowid FROM importance ORDER BY last_used LIMIT ?)",
+                (excess,))
+            self.disk_evictions += excess
+            self._disk_entries = self._conn.execute("SELECT COUNT(*) FROM importance").fetchone()[0]
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "llm_calls_saved": self.memory_hits + self.disk_hits,
+                "stores": self.stores,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_entries,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+                "disk_errors": self.disk_errors,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,134 @@
+# file: llm_backend.py
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def options_key(options: Optional[dict]) -> str:
+    return json.dumps(options or {}, sort_keys=True, separators=(",", ":"))
+
+
+class ReplayMissError(KeyError):
+    """Tidak ada respons terekam untuk (model, prompt, options) yang diminta."""
+
+
+class LiveBackend:
+    """Meneruskan permintaan ke server Ollama lewat OllamaClient."""
+    mode = "live"
+
+    def __init__(self, client):
+        self.client = client
+
+    def generate(self, model: str, prompt: str, options: Optional[dict] = None,
+                 stop_when: Optional[Callable[[str], bool]] = None) -> str:
+        return self.client.generate(model=model, prompt=prompt, options=options, stop_when=stop_when)['response']
+
+    def stats(self) -> dict:
+        return {"mode": self.mode}
+
+
+class RecordingBackend:
+    """
+    Memanggil backend lain lalu menambahkan setiap respons ke file JSONL append-only.
+    Satu baris: {"m": model, "h": sha256(prompt), "o": options, "r": respons}.
+    """
+    mode = "record"
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self.recorded = 0
+
+    def generate(self, model: str, prompt: str, options: Optional[dict] = None,
+                 stop_when: Optional[Callable[[str], bool]] = None) -> str:
+        response = self.inner.generate(model, prompt, options, stop_when=stop_when)
+        line = json.dumps({"m": model, "h": prompt_hash(prompt), "o": options or {}, "r": response},
+                          ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.recorded += 1
+        return response
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "recorded": self.recorded}
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReplayBackend:
+    """
+    Menyajikan kembali respons dari file rekaman tanpa jaringan. Kunci yang sama bisa terekam
+    berkali-kali (misalnya refleksi pada temperature > 0); respons disajikan sesuai urutan rekaman
+    dan respons terakhir dipakai ulang jika sudah habis. Latensi sintetis (detik) bisa ditambahkan
+    agar pengukuran waktu mendekati kondisi live; jitter-nya memakai RNG ber-seed sehingga deterministik.
+    Respons terekam sudah terpotong oleh stop_when saat perekaman, jadi stop_when diabaikan di sini.
+    """
+    mode = "replay"
+
+    def __init__(self, path: str, latency: float = 0.0, latency_jitter: float = 0.0, seed: int = 0):
+        self.path = path
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._responses: Dict[Tuple[str, str, str], List[str]] = defaultdict(list)
+        self._cursor: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip(): continue
+                record = json.loads(line)
+                self._responses[(record["m"], record["h"], options_key(record["o"]))].append(record["r"])
+
+    def generate(self, model: str, prompt: str, options: Optional[dict] = None,
+                 stop_when: Optional[Callable[[str], bool]] = None) -> str:
+        key = (model, prompt_hash(prompt), options_key(options))
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                self.misses += 1
+                raise ReplayMissError(f"Tidak ada rekaman untuk model={model} prompt={key[1][:12]}")
+            index = min(self._cursor[key], len(responses) - 1)
+            self._cursor[key] += 1
+            self.hits += 1
+            delay = self.latency + (self._rng.uniform(-self.latency_jitter, self.latency_jitter) if self.latency_jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        return responses[index]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "keys": len(self._responses)}
+
+
+def backend_from_env(client):
+    """
+    LLM_BACKEND=live|record|replay (default live), LLM_RECORD_PATH untuk file rekaman,
+    LLM_REPLAY_LATENCY / LLM_REPLAY_LATENCY_JITTER (detik) untuk latensi sintetis saat replay.
+    """
+    mode = os.environ.get("LLM_BACKEND", "live")
+    path = os.environ.get("LLM_RECORD_PATH", "llm_recording.jsonl")
+    if mode == "live":
+        return LiveBackend(client)
+    if mode == "record":
+        return RecordingBackend(LiveBackend(client), path)
+    if mode == "replay":
+        return ReplayBackend(path, latency=float(os.environ.get("LLM_REPLAY_LATENCY", "0")),
+                             latency_jitter=float(os.environ.get("LLM_REPLAY_LATENCY_JITTER", "0")))
+    raise ValueError(f"LLM_BACKEND tidak dikenal: '{mode}' (pilih live, record, atau replay)")
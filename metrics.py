@@ -0,0 +1,275 @@
+# file: metrics.py
+"""
+Instrumentasi ringan tanpa dependensi: counter, gauge, dan histogram berlabel dengan API mirip
+prometheus_client (metric.labels(...).inc()/observe()), ditampilkan dalam format teks Prometheus
+oleh render(). span(fase) mengukur durasi satu fase kognisi ke histogram agent_phase_seconds dan,
+jika diaktifkan, ke file trace (format Chrome Trace Event; buka di chrome://tracing atau ui.perfetto.dev).
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Batas bucket default (detik): dari operasi NumPy sub-milidetik sampai panggilan LLM puluhan detik
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf: return "+Inf"
+    if float(value).is_integer(): return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric(ABC):
+    """Dasar Counter/Gauge/Histogram; metrik berlabel menyimpan satu anak (kelas yang sama) per kombinasi label."""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_child(self) -> "_Metric":
+        """Anak tanpa label untuk satu kombinasi nilai label."""
+
+    @abstractmethod
+    def _child_samples(self, name: str, labels: Tuple[Tuple[str, str], ...]) -> List[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        """Sampel (nama, label, nilai) milik satu anak."""
+
+    def labels(self, *values, **kwargs):
+        key = tuple(str(v) for v in values) if values else tuple(str(kwargs[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        samples = []
+        children = list(self._children.items()) if self.labelnames else [((), self)]
+        for key, child in children:
+            samples.extend(child._child_samples(self.name, tuple(zip(self.labelnames, key))))
+        return samples
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for name, labels, value in self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+
+    def _new_child(self):
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _child_samples(self, name, labels):
+        return [(name, labels, self._value)]
+
+
+class Gauge(_Metric):
+    """Nilai sesaat; bisa di-set langsung atau dibaca dari fungsi saat render()."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self):
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def _child_samples(self, name, labels):
+        if self._function is not None:
+            try:
+                self._value = float(self._function())
+            except Exception:
+                pass
+        return [(name, labels, self._value)]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def _new_child(self):
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def _child_samples(self, name, labels):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            samples.append((f"{name}_bucket", labels + (("le", _format_value(bound)),), cumulative))
+        samples.append((f"{name}_sum", labels, total))
+        samples.append((f"{name}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Semua metrik dalam format teks Prometheus (text/plain; version=0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+class TraceWriter:
+    """
+    Menulis span sebagai event "X" (complete) format Chrome Trace Event, satu baris per event.
+    File berupa array JSON yang tidak ditutup; chrome://tracing dan Perfetto menerimanya apa adanya.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.events = 0
+
+    def write(self, name: str, start_ns: int, duration_ns: int, args: Optional[dict] = None):
+        event = {"name": name, "ph": "X", "ts": start_ns / 1000, "dur": duration_ns / 1000,
+                 "pid": self._pid, "tid": threading.get_ident()}
+        if args: event["args"] = args
+        line = json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file.closed: return
+            self._file.write(line + ",\n")
+            self.events += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+registry = MetricsRegistry()
+
+phase_seconds = registry.histogram("agent_phase_seconds", "Durasi fase kognisi agen dan langkah simulasi", ["phase"])
+llm_requests = registry.counter("llm_requests_total", "Panggilan LLM per jenis dan hasil", ["kind", "status"])
+llm_seconds = registry.histogram("llm_request_seconds", "Latensi panggilan LLM", ["kind"])
+llm_prompt_chars = registry.histogram("llm_prompt_chars", "Panjang prompt LLM (karakter)", ["kind"], buckets=SIZE_BUCKETS)
+llm_response_chars = registry.histogram("llm_response_chars", "Panjang respons LLM (karakter)", ["kind"], buckets=SIZE_BUCKETS)
+importance_batch_fallbacks = registry.counter("importance_batch_fallbacks_total",
+                                              "Observasi yang dinilai ulang satu per satu karena gagal di-parse dari prompt massal")
+importance_cache_lookups = registry.counter("importance_cache_lookups_total", "Pencarian cache skor kepentingan", ["result"])
+embedding_cache_lookups = registry.counter("embedding_cache_lookups_total", "Pencarian cache embedding per teks", ["result"])
+embedding_seconds = registry.histogram("embedding_encode_seconds", "Durasi satu panggilan encode model embedding")
+embedding_texts = registry.counter("embedding_texts_encoded_total", "Jumlah teks yang di-encode model embedding")
+events_ingested = registry.counter("events_ingested_total", "Event eksternal yang sudah dinilai dan di-embed")
+event_deliveries = registry.counter("event_deliveries_total", "Memori event yang ditambahkan ke aliran memori agen")
+
+_trace: Optional[TraceWriter] = None
+
+
+def enable_trace(path: str) -> TraceWriter:
+    """Mulai menulis setiap span ke file trace di `path` (menggantikan trace sebelumnya)."""
+    global _trace
+    disable_trace()
+    _trace = TraceWriter(path)
+    return _trace
+
+
+def disable_trace():
+    global _trace
+    trace, _trace = _trace, None
+    if trace is not None:
+        trace.close()
+
+
+@contextmanager
+def span(phase: str, histogram: Optional[Histogram] = None, **trace_args):
+    """
+    Mengukur blok kode sebagai satu fase ke agent_phase_seconds{phase=...}, atau ke `histogram`
+    jika diberikan. trace_args hanya ikut ditulis ke file trace.
+    """
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter_ns() - started
+        (histogram if histogram is not None else phase_seconds.labels(phase)).observe(duration / 1e9)
+        trace = _trace
+        if trace is not None:
+            trace.write(phase, started, duration, trace_args)
@@ -0,0 +1,226 @@
+# file: ollama_client.py
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+import ollama
+
+# Status HTTP yang layak dicoba ulang (server sibuk / sedang restart)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient_error(error: Exception) -> bool:
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code in RETRYABLE_STATUS
+    # ConnectionError dilempar pustaka ollama saat server tidak bisa dihubungi
+    return isinstance(error, (httpx.TransportError, ConnectionError))
+
+
+class OllamaClient:
+    """
+    Klien Ollama bersama dengan entry point sync (`generate`) dan async (`agenerate`).
+    - koneksi HTTP keep-alive dipakai ulang lewat satu httpx pool per jalur
+    - timeout per request
+    - batas request yang sedang berjalan (semaphore), sebaiknya = OLLAMA_NUM_PARALLEL server
+    - retry untuk kegagalan sementara dengan exponential backoff + jitter
+    - counter latensi, waktu tunggu antrean, dan kegagalan lewat stats()
+    - streaming dengan berhenti dini (stop_when) agar token yang tidak dipakai tidak ditunggu
+    Batas in-flight berlaku terpisah untuk jalur sync dan jalur async.
+    """
+    def __init__(self, host: Optional[str] = None, timeout: float = 60.0, max_in_flight: int = 4,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.host = host
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+        self._client = ollama.Client(host=host, timeout=timeout, limits=limits)
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        # Klien dan semaphore async terikat ke event loop, jadi dibuat saat pertama kali dipakai
+        self._async_client: Optional[ollama.AsyncClient] = None
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "successes": 0, "failures": 0, "retries": 0, "timeouts": 0,
+            "in_flight": 0, "latency_total": 0.0, "latency_max": 0.0,
+            "queue_wait_total": 0.0, "queue_wait_max": 0.0, "early_stops": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "OllamaClient":
+        return cls(
+            host=os.environ.get("OLLAMA_HOST"),
+            timeout=float(os.environ.get("OLLAMA_TIMEOUT", "60")),
+            max_in_flight=int(os.environ.get("OLLAMA_NUM_PARALLEL", "4")),
+            max_retries=int(os.environ.get("OLLAMA_MAX_RETRIES", "2")),
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": acak antara 0 dan batas eksponensial agar klien tidak retry serempak
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, queue_wait: float, latency: Optional[float] = None, error: Optional[Exception] = None):
+        with self._stats_lock:
+            s = self._stats
+            s["queue_wait_total"] += queue_wait
+            s["queue_wait_max"] = max(s["queue_wait_max"], queue_wait)
+            if latency is not None:
+                s["latency_total"] += latency
+                s["latency_max"] = max(s["latency_max"], latency)
+            if error is None:
+                s["successes"] += 1
+            elif isinstance(error, httpx.TimeoutException):
+                s["timeouts"] += 1
+
+    def _count(self, key: str, delta: int = 1):
+        with self._stats_lock:
+            self._stats[key] += delta
+
+    def _attempt(self, **kwargs):
+        queued = time.perf_counter()
+        with self._semaphore:
+            started = time.perf_counter()
+            self._count("in_flight")
+            try:
+                response = self._client.generate(**kwargs)
+            except Exception as e:
+                self._record(started - queued, time.perf_counter() - started, e)
+                raise
+            finally:
+                self._count("in_flight", -1)
+        self._record(started - queued, time.perf_counter() - started)
+        return response
+
+    def _attempt_stream(self, stop_when: Callable[[str], bool], **kwargs) -> dict:
+        queued = time.perf_counter()
+        with self._semaphore:
+            started = time.perf_counter()
+            self._count("in_flight")
+            stream = None
+            text, done = "", False
+            try:
+                stream = self._client.generate(stream=True, **kwargs)
+                for chunk in stream:
+                    text += chunk['response']
+                    if chunk.get('done'):
+                        done = True
+                        break
+                    if stop_when(text):
+                        break
+            except Exception as e:
+                self._record(started - queued, time.perf_counter() - started, e)
+                raise
+            finally:
+                # Menutup generator menutup respons HTTP sehingga server berhenti menghasilkan token
+                if stream is not None: stream.close()
+                self._count("in_flight", -1)
+        self._record(started - queued, time.perf_counter() - started)
+        if not done:
+            self._count("early_stops")
+        return {"response": text, "done": done}
+
+    def generate(self, model: str, prompt: str, options: Optional[dict] = None,
+                 stop_when: Optional[Callable[[str], bool]] = None, **kwargs):
+        """
+        Sama seperti ollama.generate(stream=False), dengan batas in-flight, timeout, dan retry.
+        Jika stop_when diberikan, respons di-stream dan dihentikan begitu stop_when(teks sejauh ini)
+        bernilai True; hasilnya dict {"response", "done"} dengan done=False bila dihentikan dini.
+        """
+        self._count("requests")
+        for attempt in range(self.max_retries + 1):
+            try:
+                if stop_when is not None:
+                    return self._attempt_stream(stop_when, model=model, prompt=prompt, options=options, **kwargs)
+                return self._attempt(model=model, prompt=prompt, options=options, stream=False, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                time.sleep(self._backoff(attempt))
+
+    def _ensure_async(self):
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+            self._async_client = ollama.AsyncClient(host=self.host, timeout=self.timeout, limits=limits)
+            self._async_semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._async_loop = loop
+
+    async def _aattempt(self, **kwargs):
+        queued = time.perf_counter()
+        async with self._async_semaphore:
+            started = time.perf_counter()
+            self._count("in_flight")
+            try:
+                response = await self._async_client.generate(**kwargs)
+            except Exception as e:
+                self._record(started - queued, time.perf_counter() - started, e)
+                raise
+            finally:
+                self._count("in_flight", -1)
+        self._record(started - queued, time.perf_counter() - started)
+        return response
+
+    async def _aattempt_stream(self, stop_when: Callable[[str], bool], **kwargs) -> dict:
+        queued = time.perf_counter()
+        async with self._async_semaphore:
+            started = time.perf_counter()
+            self._count("in_flight")
+            stream = None
+            text, done = "", False
+            try:
+                stream = await self._async_client.generate(stream=True, **kwargs)
+                async for chunk in stream:
+                    text += chunk['response']
+                    if chunk.get('done'):
+                        done = True
+                        break
+                    if stop_when(text):
+                        break
+            except Exception as e:
+                self._record(started - queued, time.perf_counter() - started, e)
+                raise
+            finally:
+                if stream is not None: await stream.aclose()
+                self._count("in_flight", -1)
+        self._record(started - queued, time.perf_counter() - started)
+        if not done:
+            self._count("early_stops")
+        return {"response": text, "done": done}
+
+    async def agenerate(self, model: str, prompt: str, options: Optional[dict] = None,
+                        stop_when: Optional[Callable[[str], bool]] = None, **kwargs):
+        """Versi async dari generate(), termasuk streaming dengan berhenti dini lewat stop_when."""
+        self._ensure_async()
+        self._count("requests")
+        for attempt in range(self.max_retries + 1):
+            try:
+                if stop_when is not None:
+                    return await self._aattempt_stream(stop_when, model=model, prompt=prompt, options=options, **kwargs)
+                return await self._aattempt(model=model, prompt=prompt, options=options, stream=False, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self._backoff(attempt))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            s = dict(self._stats)
+        attempts = s["requests"] + s["retries"]
+        s["latency_avg"] = s["latency_total"] / attempts if attempts else 0.0
+        s["queue_wait_avg"] = s["queue_wait_total"] / attempts if attempts else 0.0
+        return s
+
+    def close(self):
+        self._client.close()
@@ -1,12 +1,84 @@
-import ollama
+import os
 import re
-from typing import List
+from typing import List, Optional
 
-def get_importance_score(observation_text: str) -> int:
-    """
-    Menggunakan Ollama dengan model gemma3:4b untuk menilai pentingnya observasi.
-    """
-    prompt = f"""Anda adalah sebuah AI yang bertugas menilai seberapa penting sebuah peristiwa bagi seseorang dalam skala 1 hingga 10.
+import metrics
+from importance_cache import ImportanceCache
+from ollama_client import OllamaClient
+from llm_backend import ReplayMissError, backend_from_env
+
+MODEL_NAME = 'gemma3:4b'
+# Klien bersama: koneksi keep-alive, timeout, batas in-flight, dan retry (lihat ollama_client.py)
+client = OllamaClient.from_env()
+# Backend LLM: live (default), record, atau replay (lihat llm_backend.py dan LLM_BACKEND).
+# Untuk replay yang identik, jalankan record dan replay dengan cache yang sama-sama kosong
+# (IMPORTANCE_CACHE_PATH=""), karena skor yang diambil dari cache tidak ikut terekam.
+backend = backend_from_env(client)
+
+def set_backend(new_backend):
+    """Mengganti backend LLM yang dipakai keempat fungsi di modul ini (misalnya untuk benchmark)."""
+    global backend
+    backend = new_backend
+# Naikkan versi ini setiap kali prompt penilaian kepentingan diubah agar cache lama tidak terpakai
+IMPORTANCE_PROMPT_VERSION = "1"
+# Skor dari prompt bernomor (get_importance_scores) disimpan di bawah kunci versi sendiri: skor itu
+# tidak selalu sama dengan prompt tunggal (~95% persis di benchmark), jadi tidak boleh menimpanya.
+# Saat membaca, skor prompt tunggal didahulukan lalu skor massal dipakai sebagai cadangan.
+IMPORTANCE_BATCH_PROMPT_VERSION = IMPORTANCE_PROMPT_VERSION + "-batch"
+
+# Batas token keluaran (num_predict) per jenis panggilan; jawaban yang dipakai jauh lebih pendek
+IMPORTANCE_NUM_PREDICT = 8
+IMPORTANCE_BATCH_NUM_PREDICT_PER_ITEM = 6
+DECISION_NUM_PREDICT = 64
+REFLECTION_NUM_PREDICT = 128
+PLAN_NUM_PREDICT = 320
+
+# Jumlah observasi maksimum per prompt penilaian massal
+IMPORTANCE_BATCH_SIZE = 20
+
+# Cache skor kepentingan (LRU di memori + SQLite di disk). Set IMPORTANCE_CACHE_PATH="" untuk tanpa disk.
+importance_cache = ImportanceCache(
+    path=os.environ.get("IMPORTANCE_CACHE_PATH", "importance_cache.sqlite3") or None,
+    memory_size=int(os.environ.get("IMPORTANCE_CACHE_MEMORY_SIZE", "5000")),
+    disk_max_entries=int(os.environ.get("IMPORTANCE_CACHE_DISK_MAX", "200000")),
+)
+
+def _generate(kind: str, prompt: str, options: dict, stop_when=None) -> str:
+    """backend.generate dengan metrik per jenis panggilan (jumlah, latensi, ukuran prompt/respons)."""
+    with metrics.span(f"llm:{kind}", metrics.llm_seconds.labels(kind)):
+        try:
+            response = backend.generate(MODEL_NAME, prompt, options, stop_when=stop_when)
+        except Exception:
+            metrics.llm_requests.labels(kind, "error").inc()
+            raise
+    metrics.llm_requests.labels(kind, "ok").inc()
+    metrics.llm_prompt_chars.labels(kind).observe(len(prompt))
+    metrics.llm_response_chars.labels(kind).observe(len(response))
+    return response
+
+def _importance_complete(text: str) -> bool:
+    """Jawaban skor sudah lengkap: ada angka yang sudah diikuti karakter lain (atau sudah dua digit)."""
+    match = re.search(r'\d+', text)
+    return match is not None and (match.end() < len(text) or len(match.group(0)) >= 2)
+
+def _decision_line(text: str, complete_only: bool = False) -> Optional[str]:
+    """Baris pertama berformat `LOKASI :: AKSI`; jika complete_only, baris itu harus sudah diakhiri newline."""
+    lines = text.split("\n")
+    if complete_only:
+        lines = lines[:-1]
+    for line in lines:
+        if "::" in line:
+            return line.strip()
+    return None
+
+def _cached_score(observation_text: str) -> Optional[int]:
+    cached = importance_cache.get(observation_text, MODEL_NAME, IMPORTANCE_PROMPT_VERSION)
+    if cached is None:
+        cached = importance_cache.get(observation_text, MODEL_NAME, IMPORTANCE_BATCH_PROMPT_VERSION)
+    return cached
+
+def importance_prompt(observation_text: str) -> str:
+    return f"""Anda adalah sebuah AI yang bertugas menilai seberapa penting sebuah peristiwa bagi seseorang dalam skala 1 hingga 10.
     Skala 1 - 10, contohnya:
     1: Peristiwa yang sangat biasa dan mudah dilupakan
     5: Peristiwa yang cukup menarik tapi rutin
@@ -18,29 +90,115 @@ def get_importance_score(observation_text: str) -> int:
 
     Skor Kepentingan:"""
 
+def get_importance_score(observation_text: str) -> int:
+    """
+    Menggunakan Ollama dengan model gemma3:4b untuk menilai pentingnya observasi.
+    Skor dihitung pada temperature 0.0 (deterministik), sehingga hasilnya di-cache.
+    Respons di-stream dan dihentikan begitu angka skor lengkap diterima.
+    """
+    cached = _cached_score(observation_text)
+    if cached is not None:
+        metrics.importance_cache_lookups.labels("hit").inc()
+        return cached
+    metrics.importance_cache_lookups.labels("miss").inc()
+    return _score_uncached(observation_text)
+
+def _score_uncached(observation_text: str) -> int:
+    prompt = importance_prompt(observation_text)
     try:
         # Memastikan server Ollama berjalan
-        response = ollama.generate(
-            model='gemma3:4b',
-            prompt=prompt,
-            options={'temperature': 0.0},
-            stream=False
-        )
-        
-        text_response = response['response']
+        text_response = _generate("importance", prompt, {'temperature': 0.0, 'num_predict': IMPORTANCE_NUM_PREDICT},
+                                  stop_when=_importance_complete)
         match = re.search(r'\d+', text_response)
         
         if match:
-            score = int(match.group(0))
-            return max(1, min(10, score))
+            score = max(1, min(10, int(match.group(0))))
         else:
             print(f"Warning: Tidak dapat menemukan angka pada respons LLM. Respons: '{text_response}'. Menggunakan skor default 3.")
-            return 3
-
+            score = 3
+    except ReplayMissError:
+        # Respons rekaman yang hilang berarti replay tidak lagi identik; jangan diganti nilai cadangan
+        raise
     except Exception as e:
         print(f"Error saat menghubungi Ollama: {e}. Pastikan server Ollama sedang berjalan. Menggunakan skor default 3.")
         return 3
+    # Kegagalan disk cache ditangani ImportanceCache (best-effort); skor dari LLM tetap dikembalikan
+    importance_cache.put(observation_text, MODEL_NAME, IMPORTANCE_PROMPT_VERSION, score)
+    return score
     
+def importance_batch_prompt(observation_texts: List[str]) -> str:
+    items = "\n".join(f'{i}. "{text}"' for i, text in enumerate(observation_texts, 1))
+    return f"""Anda adalah sebuah AI yang bertugas menilai seberapa penting sebuah peristiwa bagi seseorang dalam skala 1 hingga 10.
+    Skala 1 - 10, contohnya:
+    1: Peristiwa yang sangat biasa dan mudah dilupakan
+    5: Peristiwa yang cukup menarik tapi rutin
+    10: Peristiwa yang sangat signifikan dan mengubah hidup
+
+    Tugas: Berikan skor untuk SETIAP peristiwa bernomor di bawah ini, satu baris per peristiwa,
+    dengan format `NOMOR: SKOR` (contoh: `1: 4`). Jangan tambahkan teks lain.
+
+    Peristiwa:
+{items}
+
+    Skor Kepentingan per nomor:
+"""
+
+_BATCH_SCORE_LINE = re.compile(r'^\s*(\d+)\s*[:.)=-]\s*(\d+)\s*$', re.MULTILINE)
+
+def _parse_batch_scores(text: str, count: int) -> dict:
+    """{nomor (0-based): skor} untuk baris `NOMOR: SKOR` yang valid; nomor atau skor di luar rentang diabaikan."""
+    scores = {}
+    for match in _BATCH_SCORE_LINE.finditer(text):
+        index, score = int(match.group(1)) - 1, int(match.group(2))
+        if 0 <= index < count and 1 <= score <= 10 and index not in scores:
+            scores[index] = score
+    return scores
+
+def get_importance_scores(observation_texts: List[str]) -> List[int]:
+    """
+    Skor kepentingan untuk banyak observasi sekaligus. Teks yang sudah ada di cache tidak dikirim;
+    sisanya (unik) dinilai dalam prompt bernomor berisi hingga IMPORTANCE_BATCH_SIZE observasi.
+    Item yang hilang atau tidak bisa di-parse dinilai ulang satu per satu lewat get_importance_score.
+    """
+    scores = {}
+    missing = []
+    for text in dict.fromkeys(observation_texts):
+        cached = _cached_score(text)
+        if cached is None:
+            missing.append(text)
+        else:
+            scores[text] = cached
+    metrics.importance_cache_lookups.labels("hit").inc(len(scores))
+    metrics.importance_cache_lookups.labels("miss").inc(len(missing))
+    singles, fallback = [], []
+    for start in range(0, len(missing), IMPORTANCE_BATCH_SIZE):
+        chunk = missing[start:start + IMPORTANCE_BATCH_SIZE]
+        if len(chunk) == 1:
+            # Satu observasi tidak perlu prompt bernomor; tidak dihitung sebagai fallback
+            singles.extend(chunk)
+            continue
+        try:
+            response = _generate("importance_batch", importance_batch_prompt(chunk),
+                                 {'temperature': 0.0, 'num_predict': IMPORTANCE_BATCH_NUM_PREDICT_PER_ITEM * len(chunk)},
+                                 stop_when=lambda text, n=len(chunk): len(_parse_batch_scores(text, n)) == n and text.endswith("\n"))
+            parsed = _parse_batch_scores(response, len(chunk))
+        except ReplayMissError:
+            raise
+        except Exception as e:
+            print(f"Error saat penilaian kepentingan massal: {e}. Menilai satu per satu.")
+            parsed = {}
+        for index, text in enumerate(chunk):
+            if index in parsed:
+                scores[text] = parsed[index]
+                importance_cache.put(text, MODEL_NAME, IMPORTANCE_BATCH_PROMPT_VERSION, parsed[index])
+            else:
+                fallback.append(text)
+    if fallback:
+        metrics.importance_batch_fallbacks.inc(len(fallback))
+    for text in singles + fallback:
+        scores[text] = _score_uncached(text)
+    return [scores[text] for text in observation_texts]
+
 def generate_reflection(memories_text: str) -> str:
     """Menghasilkan wawasan tingkat tinggi dari sekumpulan memori."""
     prompt = f"""Anda adalah sebuah AI yang membantu seseorang merangkum pemikirannya.
@@ -54,13 +212,10 @@ def generate_reflection(memories_text: str) -> str:
     Wawasan Tingat Tinggi (satu kalimat):"""
 
     try:
-        response = ollama.generate(
-            model='gemma3:4b',
-            prompt=prompt,
-            options={'temperature': 0.7}, # Sedikit lebih kreatif untuk refleksi
-            stream=False
-        )
-        return response['response'].strip()
+        response = _generate("reflection", prompt, {'temperature': 0.7, 'num_predict': REFLECTION_NUM_PREDICT}) # Sedikit lebih kreatif untuk refleksi
+        return response.strip()
+    except ReplayMissError:
+        raise
     except Exception as e:
         print(f"Error saat menghasilkan refleksi: {e}")
         return "Gagal melakukan refleksi."
@@ -83,41 +238,43 @@ def generate_daily_plan(agent_summary: str) -> str:
     Rencana Anda untuk hari ini:
     """
     try:
-        response = ollama.generate(
-            model='gemma3:4b',
-            prompt=prompt,
-            options={'temperature': 0.5},
-            stream=False
-        )
-        return response['response'].strip()
+        response = _generate("plan", prompt, {'temperature': 0.5, 'num_predict': PLAN_NUM_PREDICT})
+        return response.strip()
+    except ReplayMissError:
+        raise
     except Exception as e:
         print(f"Error saat menghasilkan rencana: {e}")
         return "08:00 - Gagal membuat rencana."
     
-def decide_next_action(context: str) -> str:
-    """Memutuskan tindakan spesifik berikutnya untuk agen."""
-    prompt = f"""{context}
-
-    Tugas: Apa satu tindakan fisik dan spesifik yang Anda lakukan SEKARANG?
-    Gunakan format yang sangat ketat: `[NAMA LOKASI BARU] :: [DESKRIPSI AKSI SINGKAT]`
-    - Ubah NAMA LOKASI BARU hanya jika Anda pindah. Jika tidak, gunakan lokasi saat ini.
-    - DESKRIPSI AKSI SINGKAT harus berupa kalimat aktif (misal: "Memalu besi panas", bukan "Sedang memalu").
+# Instruksi tugas diletakkan di awal prompt: sama untuk semua agen dan tick, jadi bisa diambil dari KV cache server
+DECISION_INSTRUCTIONS = """Tugas: Apa satu tindakan fisik dan spesifik yang Anda lakukan SEKARANG?
+Gunakan format yang sangat ketat: `[NAMA LOKASI BARU] :: [DESKRIPSI AKSI SINGKAT]`
+- Ubah NAMA LOKASI BARU hanya jika Anda pindah. Jika tidak, gunakan lokasi saat ini.
+- DESKRIPSI AKSI SINGKAT harus berupa kalimat aktif (misal: "Memalu besi panas", bukan "Sedang memalu").
 
-    Contoh:
-    - Bengkel :: Memanaskan sebatang besi di tungku api.
-    - Balai Kota :: Berjalan menuju taman.
-    - Taman :: Duduk di bangku sambil membaca buku.
+Contoh:
+- Bengkel :: Memanaskan sebatang besi di tungku api.
+- Balai Kota :: Berjalan menuju taman.
+- Taman :: Duduk di bangku sambil membaca buku."""
 
-    Tindakan Anda sekarang:
+def decide_next_action(context: str) -> str:
+    """
+    Memutuskan tindakan spesifik berikutnya untuk agen.
+    `context` sebaiknya disusun dengan prompt_builder.decision_context (bagian stabil di depan).
+    Respons di-stream dan dihentikan begitu satu baris `LOKASI :: AKSI` lengkap diterima.
     """
+    prompt = f"""{DECISION_INSTRUCTIONS}
+
+{context}
+
+Tindakan Anda sekarang:
+"""
     try:
-        response = ollama.generate(
-            model='gemma3:4b',
-            prompt=prompt,
-            options={'temperature': 0.5},
-            stream=False
-        )
-        return response['response'].strip()
+        response = _generate("decision", prompt, {'temperature': 0.5, 'num_predict': DECISION_NUM_PREDICT},
+                             stop_when=lambda text: _decision_line(text, complete_only=True) is not None)
+        return _decision_line(response) or response.strip()
+    except ReplayMissError:
+        raise
     except Exception as e:
         print(f"Error saat memutuskan tindakan: {e}")
         return "Lokasi Saat Ini :: Berdiam diri dan berpikir."
\ No newline at end of file
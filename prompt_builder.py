@@ -0,0 +1,57 @@
+# file: prompt_builder.py
+"""
+Penyusunan prompt keputusan agen.
+
+Server Ollama bisa memakai ulang KV cache untuk awalan prompt yang sama persis dengan prompt
+sebelumnya, jadi bagian yang jarang berubah diletakkan di depan dan yang berubah tiap tick di belakang:
+    instruksi tugas (sama untuk semua agen, lihat ollama_interface.decide_next_action)
+    identitas agen (tetap sepanjang simulasi)
+    rencana, lokasi, status (berubah sesekali)
+    memori relevan, observasi, waktu (berubah hampir setiap tick)
+Memori relevan dibatasi anggaran token agar panjang prompt tidak tumbuh tanpa batas.
+"""
+
+from typing import List, Sequence
+
+# Perkiraan kasar jumlah karakter per token; cukup untuk menegakkan anggaran tanpa tokenizer
+CHARS_PER_TOKEN = 4
+DEFAULT_MEMORY_TOKEN_BUDGET = 200
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def fit_to_token_budget(items: Sequence[str], budget: int) -> List[str]:
+    """
+    Mengambil item sesuai urutan (paling relevan dulu) selama total perkiraan token <= budget.
+    Item pertama yang terlalu panjang dipotong agar konteks tidak kosong sama sekali.
+    """
+    selected: List[str] = []
+    used = 0
+    for item in items:
+        cost = estimate_tokens(item) + 1  # +1 untuk penanda daftar dan baris baru
+        if used + cost > budget:
+            if not selected and budget > 1:
+                selected.append(item[:(budget - 1) * CHARS_PER_TOKEN].rstrip() + "…")
+            break
+        selected.append(item)
+        used += cost
+    return selected
+
+
+def decision_context(name: str, description: str, plan_activity: str, location: str, status: str,
+                     memories: Sequence[str], observation: str, current_time_str: str,
+                     memory_token_budget: int = DEFAULT_MEMORY_TOKEN_BUDGET) -> str:
+    """Konteks untuk decide_next_action, dari bagian paling stabil ke paling berubah-ubah."""
+    memory_lines = [f"- {m}" for m in fit_to_token_budget(memories, memory_token_budget)] or ["- (tidak ada)"]
+    return "\n".join([
+        f"Anda adalah {name}. Identitas Anda: {description}.",
+        f"Rencana Anda untuk saat ini adalah: \"{plan_activity}\".",
+        f"Lokasi saat ini: {location}.",
+        f"Status saat ini: {status}.",
+        "Memori yang relevan dengan situasi ini:",
+        *memory_lines,
+        f"Anda baru saja mengamati: \"{observation}\".",
+        f"Waktu: {current_time_str}.",
+    ])
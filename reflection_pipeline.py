@@ -0,0 +1,148 @@
+# file: reflection_pipeline.py
+
+import itertools
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from llm_backend import ReplayMissError
+
+
+class _ReflectionJob:
+    __slots__ = ("seq", "agent", "memories_text", "priority", "submitted_wall", "submitted_sim", "result", "error")
+
+    def __init__(self, seq: int, agent, memories_text: str, priority: float, submitted_sim: Optional[datetime]):
+        self.seq = seq
+        self.agent = agent
+        self.memories_text = memories_text
+        self.priority = priority
+        self.submitted_wall = time.perf_counter()
+        self.submitted_sim = submitted_sim
+        self.result = None
+        self.error: Optional[Exception] = None
+
+
+class ReflectionPipeline:
+    """
+    Antrean refleksi di latar belakang agar act() tidak menunggu LLM refleksi.
+    - pekerja terbatas (max_workers thread) mengambil pekerjaan berprioritas tertinggi lebih dulu
+      (prioritas = akumulasi importance saat refleksi dipicu)
+    - satu agen hanya punya satu refleksi tertunda pada satu waktu
+    - hasil tidak langsung ditulis ke MemoryStream; merge_completed() dipanggil Environment di batas tick
+
+    Agen cukup menyediakan compose_reflection(memories_text) (dijalankan di thread pekerja,
+    mengembalikan Memory atau None) dan merge_reflection(memory) (dijalankan di thread simulasi).
+    """
+    def __init__(self, max_workers: int = 2, max_queue: int = 1000):
+        self.max_workers = max_workers
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue(maxsize=max_queue)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._completed: List[_ReflectionJob] = []
+        self._pending_agents = set()
+        self._workers: List[threading.Thread] = []
+        self._stopping = False
+        self.submitted = 0
+        self.merged = 0
+        self.failed = 0
+        self.dropped = 0
+        self.in_progress = 0
+        self._lag_seconds_total = 0.0
+        self._lag_seconds_max = 0.0
+        self._lag_sim_minutes_total = 0.0
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"reflection-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, agent, memories_text: str, priority: float, submitted_sim: Optional[datetime] = None) -> bool:
+        """Mengantrekan refleksi; False jika agen masih punya refleksi tertunda atau antrean penuh."""
+        with self._lock:
+            if self._stopping or agent in self._pending_agents:
+                return False
+            job = _ReflectionJob(next(self._counter), agent, memories_text, priority, submitted_sim)
+            try:
+                # Prioritas tertinggi dulu; urutan masuk sebagai pemecah seri
+                self._queue.put_nowait((-priority, job.seq, job))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending_agents.add(agent)
+            self.submitted += 1
+            self._start_workers()
+        return True
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self.in_progress += 1
+            try:
+                job.result = job.agent.compose_reflection(job.memories_text)
+            except Exception as e:
+                job.error = e
+            with self._lock:
+                self.in_progress -= 1
+                self._completed.append(job)
+
+    def merge_completed(self, current_sim: Optional[datetime] = None) -> int:
+        """Menulis refleksi yang sudah selesai ke MemoryStream agennya (urutan pengajuan). Mengembalikan jumlahnya."""
+        with self._lock:
+            completed, self._completed = self._completed, []
+        completed.sort(key=lambda job: job.seq)
+        merged = 0
+        now = time.perf_counter()
+        for job in completed:
+            with self._lock:
+                self._pending_agents.discard(job.agent)
+                lag = now - job.submitted_wall
+                self._lag_seconds_total += lag
+                self._lag_seconds_max = max(self._lag_seconds_max, lag)
+                if current_sim is not None and job.submitted_sim is not None:
+                    self._lag_sim_minutes_total += (current_sim - job.submitted_sim).total_seconds() / 60
+                if job.error is not None or job.result is None:
+                    self.failed += 1
+                    if isinstance(job.error, ReplayMissError): raise job.error
+                    if job.error is not None: print(f"Error saat refleksi {getattr(job.agent, 'name', '?')}: {job.error}")
+                    continue
+                self.merged += 1
+            job.agent.merge_reflection(job.result)
+            merged += 1
+        return merged
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.merged + self.failed
+            return {
+                "queue_depth": self._queue.qsize(),
+                "in_progress": self.in_progress,
+                "awaiting_merge": len(self._completed),
+                "submitted": self.submitted,
+                "merged": self.merged,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "lag_seconds_avg": self._lag_seconds_total / finished if finished else 0.0,
+                "lag_seconds_max": self._lag_seconds_max,
+                "lag_sim_minutes_avg": self._lag_sim_minutes_total / finished if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            self._stopping = True
+            workers = list(self._workers)
+        for _ in workers:
+            # Sentinel dengan prioritas paling rendah agar pekerjaan yang sudah antre tetap selesai
+            self._queue.put((float("inf"), float("inf"), None))
+        if wait:
+            for worker in workers:
+                worker.join()
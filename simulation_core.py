@@ -1,58 +1,500 @@
 # file: simulation_core.py
 
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Callable, Deque, List, Dict, NamedTuple, Optional, Sequence, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import os
+import sys
+import threading
 import time # BARU: Untuk jeda antar step simulasi
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import uuid
 
 # DIPERBARUI: Impor fungsi terakhir
-from ollama_interface import get_importance_score, generate_reflection, generate_daily_plan, decide_next_action
+import ollama_interface
+from ollama_interface import get_importance_score, get_importance_scores, generate_reflection, generate_daily_plan, decide_next_action
+from embedding_service import EmbeddingService, embedding_backend_from_env
+import metrics
+from cold_storage import ColdMemoryTier
+from ann_index import IVFIndex
+from reflection_pipeline import ReflectionPipeline
+from tick_scheduler import TickScheduler
+from prompt_builder import DEFAULT_MEMORY_TOKEN_BUDGET, decision_context
 
-# --- (Tidak ada perubahan pada bagian loading model, get_embedding, Memory, MemoryStream) ---
-print("Memuat model embedding...")
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2'); print("Model embedding berhasil dimuat.")
-def get_embedding(text: str) -> np.ndarray: return embedding_model.encode(text)
+# Waktu awal jam tetap saat replay rekaman LLM, jika SIMULATION_CLOCK tidak diisi
+REPLAY_CLOCK_START = "2000-01-01T00:00:00"
+
+def fixed_clock(at: datetime) -> Callable[[], datetime]:
+    """Jam deterministik yang selalu mengembalikan waktu yang sama."""
+    return lambda: at
+
+def clock_from_env() -> Callable[[], datetime]:
+    """
+    SIMULATION_CLOCK=wall (jam dinding) atau waktu ISO (jam tetap). Saat LLM_BACKEND=replay defaultnya
+    jam tetap REPLAY_CLOCK_START, sehingga timestamp memori (dan tanggal Environment.start_time)
+    sama persis di setiap replay.
+    """
+    default = REPLAY_CLOCK_START if ollama_interface.backend.mode == "replay" else "wall"
+    value = os.environ.get("SIMULATION_CLOCK", default)
+    if value == "wall":
+        return datetime.now
+    return fixed_clock(datetime.fromisoformat(value))
+
+# Sumber waktu dinding untuk timestamp memori. Bisa diganti dengan jam deterministik
+# (misalnya saat replay rekaman LLM) agar sebuah run dapat direproduksi persis.
+clock: Callable[[], datetime] = clock_from_env()
+
+# Model embedding dimuat secara malas saat pertama dipakai (atau lewat embedding_model.warm_up()).
+# Backend dipilih lewat EMBEDDING_BACKEND: torch (default), onnx, onnx-quantized, atau hash.
+embedding_model = embedding_backend_from_env()
+# Layanan embedding bersama: cache LRU per teks untuk semua agen + batching per step
+embedding_service = EmbeddingService(embedding_model)
+def get_embedding(text: str) -> np.ndarray: return embedding_service.encode(text)
 
 class Memory:
-    # ... (Sama seperti sebelumnya)
+    # __slots__: tanpa __dict__ per objek. Objek Memory hanya dibuat saat memori baru masuk atau
+    # saat dibaca dari MemoryStream; penyimpanan jangka panjang ada di kolom-kolom MemoryStream.
+    __slots__ = ('timestamp', 'description', 'importance', 'last_accessed', 'embedding')
     def __init__(self, timestamp: datetime, description: str, is_reflection: bool = False):
         self.timestamp = timestamp; self.description = description
         self.importance = get_importance_score(description)
         if is_reflection: self.importance = max(self.importance, 8)
         self.last_accessed = timestamp; self.embedding = get_embedding(description)
+    @classmethod
+    def precomputed(cls, timestamp: datetime, description: str, importance: int, embedding: np.ndarray) -> 'Memory':
+        """Membuat Memory dari nilai yang sudah dihitung (tanpa panggilan LLM/embedding)."""
+        memory = cls.__new__(cls)
+        memory.timestamp = timestamp; memory.description = description
+        memory.importance = importance; memory.last_accessed = timestamp; memory.embedding = embedding
+        return memory
     def __repr__(self): return f"Memory(t='{self.timestamp.strftime('%H:%M')}', imp={self.importance}, desc='{self.description}')"
 
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+def _to_micros(moment: datetime) -> int: return (moment - _EPOCH) // _MICROSECOND
+def _from_micros(micros: int) -> datetime: return _EPOCH + timedelta(microseconds=int(micros))
+
+class MemoryList(Sequence):
+    """Tampilan baca-saja atas semua memori dalam urutan masuk; objek Memory dibuat saat diakses."""
+    def __init__(self, stream: 'MemoryStream'): self._stream = stream
+    def __len__(self): return len(self._stream)
+    def __getitem__(self, index):
+        tiers, rows = self._stream._ordered_rows()
+        if isinstance(index, slice):
+            return [self._stream._materialize(t, r) for t, r in zip(tiers[index], rows[index])]
+        return self._stream._materialize(tiers[index], rows[index])
+
 class MemoryStream:
-    # ... (Sama seperti sebelumnya)
-    def __init__(self): self.memories: List[Memory] = []
+    """
+    Aliran memori agen dalam bentuk struct-of-arrays: embedding (dinormalisasi, float32 atau
+    float16), timestamp (mikrodetik), importance, urutan masuk, dan deskripsi yang di-intern.
+    Array tumbuh berlipat ganda, sehingga retrieval cukup satu perkalian matriks-vektor.
+
+    Jika ram_budget_mb diisi, memori lama yang importance-nya rendah dipindahkan ke
+    ColdMemoryTier (file memory-mapped di cold_dir) begitu tingkat "panas" melewati anggaran;
+    memori dingin tetap ikut dinilai saat retrieval.
+
+    Jika ann=True, begitu aliran berisi ann_min_size memori dibangun IVFIndex atas semua embedding
+    (kedua tingkat) dan diperbarui setiap ada memori baru. Retrieval lalu hanya menilai kandidat dari
+    ann_probe daftar IVF terdekat ditambah _ANN_RECENT memori terbaru (agar suku recency tidak
+    kehilangan kandidat); aliran yang lebih kecil tetap di-scan penuh. Pelatihan (dan pelatihan ulang
+    setiap aliran tumbuh _ANN_REBUILD_GROWTH kali) berjalan di thread latar; selama itu retrieval
+    memakai indeks lama (atau scan penuh jika belum ada) sampai indeks baru siap dan dipasang.
+    Karena saat pemasangan itu bergantung pada waktu, replay yang harus identik sebaiknya memakai
+    ann_background=False (pembangunan langsung di add_memory seperti sebelumnya).
+    """
+    _INITIAL_CAPACITY = 64
+    _SCORE_CHUNK = 65536  # baris per potongan saat menilai embedding float16 / memmap
+    _IMPORTANCE_WINDOW = 100
+    _ANN_RECENT = 256
+    _ANN_REBUILD_GROWTH = 4  # latih ulang centroid setiap aliran tumbuh 4x sejak pelatihan terakhir
+    _ANN_SAMPLE_PER_LIST = 32
+    _ANN_BUILD_CHUNK = 8192  # baris yang disalin per pengambilan kunci saat indeks baru diisi
+
+    def __init__(self, embedding_dtype=np.float32, ram_budget_mb: Optional[float] = None, cold_dir: Optional[str] = None,
+                 ann: bool = False, ann_probe: int = 8, ann_min_size: int = 5000, ann_background: bool = True):
+        self.embedding_dtype = np.dtype(embedding_dtype)
+        self.ram_budget_mb = ram_budget_mb
+        self.cold_dir = cold_dir
+        self.ann = ann
+        self.ann_probe = ann_probe
+        self.ann_min_size = ann_min_size
+        self.ann_background = ann_background
+        self._ann: Optional[IVFIndex] = None
+        self._ann_next_build = ann_min_size
+        # Thread pembangun indeks hanya membaca lewat peta urutan -> lokasi di bawah _ann_lock, karena
+        # _spill memindahkan baris panas. _ann_seq_end: urutan di bawahnya sudah tercatat di peta/indeks.
+        self._ann_lock = threading.Lock()
+        self._ann_seq_end = 0
+        self._ann_builder: Optional[threading.Thread] = None
+        self._ann_cancel = threading.Event()
+        # urutan masuk -> (tingkat, baris); hanya dipelihara jika ann aktif. Tingkat -1 = tidak ada
+        self._seq_tier: Optional[np.ndarray] = np.full(self._INITIAL_CAPACITY, -1, dtype=np.int8) if ann else None
+        self._seq_row: Optional[np.ndarray] = np.empty(self._INITIAL_CAPACITY, dtype=np.int64) if ann else None
+        self._size = 0
+        self._next_seq = 0
+        self._version = 0
+        self._ordered_cache = None
+        self._embeddings: Optional[np.ndarray] = None  # dialokasikan saat memori pertama masuk
+        self._timestamps = np.empty(self._INITIAL_CAPACITY, dtype=np.int64)
+        self._importances = np.empty(self._INITIAL_CAPACITY, dtype=np.float32)
+        self._seq = np.empty(self._INITIAL_CAPACITY, dtype=np.int64)
+        self._is_reflection = np.empty(self._INITIAL_CAPACITY, dtype=bool)
+        self._descriptions: List[str] = []
+        self._max_hot_rows: Optional[int] = None
+        self._cold: Optional[ColdMemoryTier] = None
+        self._recent_importances: Deque[int] = deque(maxlen=self._IMPORTANCE_WINDOW)
+        self._recent_importance_total = 0
+        # Identitas aliran; dipakai checkpoint untuk mengenali aliran yang sama antar snapshot
+        self.stream_id = uuid.uuid4().hex
+
+    def __len__(self): return self._size + (self._cold.size if self._cold else 0)
+
+    @property
+    def memories(self) -> MemoryList: return MemoryList(self)
+
+    def _ensure_capacity(self, dim: int):
+        capacity = len(self._timestamps)
+        if self._embeddings is None:
+            self._embeddings = np.empty((capacity, dim), dtype=self.embedding_dtype)
+            if self.ram_budget_mb is not None:
+                # Perkiraan byte per baris: embedding + kolom numerik + pointer deskripsi
+                row_bytes = dim * self.embedding_dtype.itemsize + 8 + 4 + 8 + 1 + 8
+                self._max_hot_rows = max(4, int(self.ram_budget_mb * 1024 * 1024 / row_bytes))
+        if self._size < capacity: return
+        new_capacity = capacity * 2
+        for attr in ('_embeddings', '_timestamps', '_importances', '_seq', '_is_reflection'):
+            old = getattr(self, attr)
+            grown = np.empty((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self._size] = old[:self._size]
+            setattr(self, attr, grown)
+
+    def _append_row(self, timestamp: datetime, description: str, importance: float, embedding: np.ndarray, is_reflection: bool):
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        self._ensure_capacity(embedding.shape[0])
+        norm = np.linalg.norm(embedding)
+        i = self._size
+        self._embeddings[i] = embedding / norm if norm > 0 else embedding
+        self._timestamps[i] = _to_micros(timestamp)
+        self._importances[i] = importance
+        self._seq[i] = self._next_seq
+        self._is_reflection[i] = is_reflection
+        self._descriptions.append(sys.intern(description))
+        self._track_importance(int(importance))
+        self._size += 1
+        self._next_seq += 1
+        self._version += 1
+        if self._seq_tier is not None:
+            self._ann_added(i, i + 1)
+        if self._max_hot_rows is not None and self._size > self._max_hot_rows:
+            self._spill()
+
+    @property
+    def next_seq(self) -> int: return self._next_seq
+
+    @property
+    def embedding_dim(self) -> Optional[int]:
+        return None if self._embeddings is None else self._embeddings.shape[1]
+
+    def export_since(self, seq_start: int) -> Dict[str, object]:
+        """Kolom semua memori dengan urutan >= seq_start (dari kedua tingkat), diurutkan per urutan masuk."""
+        hot = np.flatnonzero(self._seq[:self._size] >= seq_start)
+        cold = np.flatnonzero(self._cold.seq[:self._cold.size] >= seq_start) if self._cold and self._cold.size else np.empty(0, np.int64)
+        dim = self.embedding_dim or 0
+        parts = {
+            "embeddings": [self._embeddings[hot] if len(hot) else np.empty((0, dim), self.embedding_dtype)],
+            "timestamps": [self._timestamps[hot]], "importances": [self._importances[hot]],
+            "seq": [self._seq[hot]], "is_reflection": [self._is_reflection[hot]],
+        }
+        descriptions = [self._descriptions[i] for i in hot]
+        if len(cold):
+            c = self._cold
+            for key, column in (("embeddings", c.embeddings), ("timestamps", c.timestamps), ("importances", c.importances),
+                                ("seq", c.seq), ("is_reflection", c.is_reflection)):
+                parts[key].append(np.asarray(column[cold]))
+            descriptions += [c.descriptions[i] for i in cold]
+        columns = {key: np.concatenate(arrays) for key, arrays in parts.items()}
+        order = np.argsort(columns["seq"], kind='stable')
+        columns = {key: value[order] for key, value in columns.items()}
+        columns["descriptions"] = [descriptions[i] for i in order]
+        return columns
+
+    def extend_columns(self, embeddings: np.ndarray, timestamps: np.ndarray, importances: np.ndarray,
+                       seq: np.ndarray, is_reflection: np.ndarray, descriptions: List[str]):
+        """Menambahkan banyak memori sekaligus dari kolom hasil export_since (embedding sudah dinormalisasi)."""
+        count = len(seq)
+        if count == 0: return
+        self._ensure_capacity(embeddings.shape[1])
+        capacity = len(self._timestamps)
+        if self._size + count > capacity:
+            while capacity < self._size + count: capacity *= 2
+            for attr in ('_embeddings', '_timestamps', '_importances', '_seq', '_is_reflection'):
+                old = getattr(self, attr)
+                grown = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+                grown[:self._size] = old[:self._size]
+                setattr(self, attr, grown)
+        end = self._size + count
+        self._embeddings[self._size:end] = embeddings
+        self._timestamps[self._size:end] = timestamps
+        self._importances[self._size:end] = importances
+        self._seq[self._size:end] = seq
+        self._is_reflection[self._size:end] = is_reflection
+        self._descriptions.extend(sys.intern(d) for d in descriptions)
+        for importance in importances[-self._IMPORTANCE_WINDOW:]:
+            self._track_importance(int(importance))
+        start, self._size = self._size, end
+        self._next_seq = max(self._next_seq, int(seq[-1]) + 1)
+        self._version += 1
+        if self._seq_tier is not None:
+            self._ann_added(start, end)
+        if self._max_hot_rows is not None and self._size > self._max_hot_rows:
+            self._spill()
+
+    def _spill(self):
+        """Pindahkan sebagian memori lama ber-importance rendah ke tingkat dingin (memmap)."""
+        with self._ann_lock:
+            self._spill_locked()
+
+    def _spill_locked(self):
+        n = self._size
+        # Turunkan tingkat panas ke 3/4 anggaran sekaligus (juga berlaku untuk penambahan massal)
+        spill_count = max(1, n - self._max_hot_rows * 3 // 4)
+        window = min(n, max(spill_count, n // 2))  # hanya separuh memori tertua yang jadi kandidat
+        # Refleksi tidak dipindahkan kecuali tidak ada pilihan lain
+        priority = self._importances[:window] + 100.0 * self._is_reflection[:window]
+        chosen = np.sort(np.argsort(priority, kind='stable')[:spill_count])
+        if self._cold is None:
+            self._cold = ColdMemoryTier(self._embeddings.shape[1], self.embedding_dtype, self.cold_dir)
+        moved_seq, cold_start = self._seq[chosen], self._cold.size
+        self._cold.append(self._embeddings[chosen], self._timestamps[chosen], self._importances[chosen],
+                          self._seq[chosen], self._is_reflection[chosen], [self._descriptions[i] for i in chosen])
+        keep = np.ones(n, dtype=bool); keep[chosen] = False
+        remaining = n - len(chosen)
+        for attr in ('_embeddings', '_timestamps', '_importances', '_seq', '_is_reflection'):
+            arr = getattr(self, attr)
+            arr[:remaining] = arr[:n][keep]
+        self._descriptions = [d for d, k in zip(self._descriptions, keep) if k]
+        self._size = remaining
+        if self._seq_tier is not None:
+            self._set_locations(moved_seq, 1, np.arange(cold_start, cold_start + len(moved_seq)))
+            self._set_locations(self._seq[:remaining], 0, np.arange(remaining))
+
+    def _set_locations(self, seq: np.ndarray, tier: int, rows: np.ndarray):
+        needed = int(seq.max()) + 1 if len(seq) else 0
+        if needed > len(self._seq_tier):
+            capacity = len(self._seq_tier)
+            while capacity < needed: capacity *= 2
+            tiers = np.full(capacity, -1, dtype=np.int8); tiers[:len(self._seq_tier)] = self._seq_tier
+            positions = np.empty(capacity, dtype=np.int64); positions[:len(self._seq_row)] = self._seq_row
+            self._seq_tier, self._seq_row = tiers, positions
+        self._seq_tier[seq] = tier
+        self._seq_row[seq] = rows
+
+    def _ann_added(self, start: int, end: int):
+        """Baris panas [start, end) baru saja ditambahkan: catat lokasinya dan masukkan ke indeks."""
+        with self._ann_lock:
+            self._set_locations(self._seq[start:end], 0, np.arange(start, end))
+            if self._ann is not None:
+                self._ann.add(self._embeddings[start:end], self._seq[start:end])
+            self._ann_seq_end = max(self._ann_seq_end, int(self._seq[end - 1]) + 1)
+        if len(self) >= self._ann_next_build and (self._ann_builder is None or not self._ann_builder.is_alive()):
+            n = len(self)
+            self._ann_next_build = n * self._ANN_REBUILD_GROWTH
+            if not self.ann_background:
+                self._build_ann(n)
+                return
+            self._ann_builder = threading.Thread(target=self._build_ann, args=(n,), name="ann-build", daemon=True)
+            self._ann_builder.start()
+
+    def _gather_by_seq(self, seq: np.ndarray) -> np.ndarray:
+        """Salinan float32 embedding untuk urutan `seq` dari tingkat mana pun. Pemanggil memegang _ann_lock."""
+        tiers, rows = self._seq_tier[seq], self._seq_row[seq]
+        out = np.empty((len(seq), self.embedding_dim), dtype=np.float32)
+        hot = tiers == 0
+        out[hot] = self._embeddings[rows[hot]]
+        if not hot.all():
+            out[~hot] = self._cold.embeddings[rows[~hot]]
+        return out
+
+    def _build_ann(self, n: int):
+        """
+        Thread latar: (re)train centroid IVF pada sampel memori lalu isi indeks baru per potongan.
+        Memori yang masuk selama pembangunan ditambahkan saat pemasangan, di bawah kunci yang sama
+        dengan _ann_added, sehingga tidak ada yang terlewat atau masuk dua kali.
+        """
+        with self._ann_lock:
+            watermark = self._ann_seq_end
+        n_lists = IVFIndex.lists_for(n)
+        picks = np.sort(np.random.default_rng(n).choice(watermark, min(watermark, n_lists * self._ANN_SAMPLE_PER_LIST), replace=False))
+        with self._ann_lock:
+            sample = self._gather_by_seq(picks[self._seq_tier[picks] >= 0])
+        index = IVFIndex(self.embedding_dim, n_probe=self.ann_probe)
+        index.train(sample, n_lists)
+        for start in range(0, watermark, self._ANN_BUILD_CHUNK):
+            if self._ann_cancel.is_set(): return
+            seq = np.arange(start, min(watermark, start + self._ANN_BUILD_CHUNK))
+            with self._ann_lock:
+                seq = seq[self._seq_tier[seq] >= 0]
+                embeddings = self._gather_by_seq(seq)
+            index.add(embeddings, seq)
+        with self._ann_lock:
+            if self._ann_cancel.is_set(): return
+            for start in range(watermark, self._ann_seq_end, self._ANN_BUILD_CHUNK):
+                seq = np.arange(start, min(self._ann_seq_end, start + self._ANN_BUILD_CHUNK))
+                seq = seq[self._seq_tier[seq] >= 0]
+                index.add(self._gather_by_seq(seq), seq)
+            self._ann = index
+
+    def wait_for_ann(self, timeout: Optional[float] = None) -> bool:
+        """Menunggu pembangunan indeks yang sedang berjalan; True jika tidak ada lagi yang berjalan."""
+        builder = self._ann_builder
+        if builder is not None:
+            builder.join(timeout)
+            return not builder.is_alive()
+        return True
+
+    def _materialize(self, tier: int, row: int) -> Memory:
+        if tier == 0:
+            ts, desc, imp, emb = self._timestamps[row], self._descriptions[row], self._importances[row], self._embeddings[row]
+        else:
+            c = self._cold
+            ts, desc, imp, emb = c.timestamps[row], c.descriptions[row], c.importances[row], c.embeddings[row]
+        return Memory.precomputed(_from_micros(ts), desc, int(imp), np.array(emb, dtype=np.float32))
+
+    def _ordered_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(tier, baris) untuk semua memori, diurutkan sesuai urutan masuk. Di-cache per versi."""
+        if self._ordered_cache is None or self._ordered_cache[0] != self._version:
+            cold_size = self._cold.size if self._cold else 0
+            seq = np.concatenate([self._seq[:self._size], self._cold.seq[:cold_size] if cold_size else np.empty(0, np.int64)])
+            tiers = np.concatenate([np.zeros(self._size, np.int8), np.ones(cold_size, np.int8)])
+            rows = np.concatenate([np.arange(self._size), np.arange(cold_size)])
+            order = np.argsort(seq, kind='stable')
+            self._ordered_cache = (self._version, tiers[order], rows[order])
+        return self._ordered_cache[1], self._ordered_cache[2]
+
+    def _recent_rows(self, n: int) -> List[Tuple[int, int]]:
+        """n memori terbaru (tier, baris) tanpa mengurutkan seluruh aliran."""
+        candidates = [(self._seq[i], 0, i) for i in range(max(0, self._size - n), self._size)]
+        if self._cold and self._cold.size:
+            cold_seq = self._cold.seq[:self._cold.size]
+            top = np.argpartition(-cold_seq, min(n, len(cold_seq)) - 1)[:n] if len(cold_seq) > n else np.arange(len(cold_seq))
+            candidates += [(cold_seq[i], 1, i) for i in top]
+        candidates.sort()
+        return [(tier, row) for _, tier, row in candidates[-n:]] if n > 0 else []
+
+    def recent(self, n: int) -> List[Memory]:
+        return [self._materialize(tier, row) for tier, row in self._recent_rows(n)]
+
+    def _track_importance(self, importance: int):
+        """Jumlah berjalan importance dari _IMPORTANCE_WINDOW memori terakhir (pemicu refleksi)."""
+        if len(self._recent_importances) == self._IMPORTANCE_WINDOW:
+            self._recent_importance_total -= self._recent_importances[0]
+        self._recent_importances.append(importance)
+        self._recent_importance_total += importance
+
+    @property
+    def recent_importance_total(self) -> int: return self._recent_importance_total
+
     def add_memory(self, description: str, is_reflection: bool = False):
-        new_memory = Memory(datetime.now(), description, is_reflection)
-        self.memories.append(new_memory)
+        new_memory = Memory(clock(), description, is_reflection)
+        self._append_row(new_memory.timestamp, new_memory.description, new_memory.importance, new_memory.embedding, is_reflection)
         print(f"    -> {'REFLEKSI' if is_reflection else 'Memori'}: '{new_memory.description}' (imp: {new_memory.importance})")
-        return sum(m.importance for m in self.memories[-100:])
-    def retrieve_memories(self, current_time: datetime, query: str, top_k: int = 3) -> List[Memory]:
-        # (Fungsi ini tidak berubah)
-        query_embedding = get_embedding(query)
-        all_memory_embeddings = [mem.embedding for mem in self.memories]
-        if not all_memory_embeddings: return []
-        relevance_scores = cosine_similarity([query_embedding], all_memory_embeddings)[0]
-        scored_memories = [];
-        for i, memory in enumerate(self.memories):
-            recency = max(0, 1 - (current_time - memory.timestamp).total_seconds() / (3600*24))
-            relevance = relevance_scores[i]
-            combined_score = (1.5 * relevance) + (1.0 * (memory.importance / 10)) + (0.8 * recency)
-            scored_memories.append((combined_score, memory))
-        scored_memories.sort(key=lambda x: x[0], reverse=True)
-        return [memory for score, memory in scored_memories[:top_k]]
+        return self._recent_importance_total
+
+    def add_precomputed(self, memory: Memory, is_reflection: bool = False):
+        """Menambahkan Memory yang skor dan embedding-nya sudah ada (misalnya saat memuat data)."""
+        self._append_row(memory.timestamp, memory.description, memory.importance, memory.embedding, is_reflection)
+        return self._recent_importance_total
+
+    def _score(self, embeddings: np.ndarray, timestamps: np.ndarray, importances: np.ndarray,
+               query_embedding: np.ndarray, now_micros: int) -> np.ndarray:
+        if embeddings.dtype == np.float32 and not isinstance(embeddings, np.memmap):
+            relevance = embeddings @ query_embedding
+        else:
+            # float16/memmap dinilai per potongan agar tidak membuat salinan float32 seluruh matriks
+            relevance = np.empty(len(embeddings), dtype=np.float32)
+            for start in range(0, len(embeddings), self._SCORE_CHUNK):
+                chunk = np.asarray(embeddings[start:start + self._SCORE_CHUNK], dtype=np.float32)
+                relevance[start:start + len(chunk)] = chunk @ query_embedding
+        # Rumus skor sama seperti sebelumnya: 1.5*relevance + 1.0*importance/10 + 0.8*recency
+        recency = np.maximum(0.0, 1.0 - (now_micros - timestamps) / (3600*24*1e6))
+        return 1.5 * relevance + importances / 10 + 0.8 * recency
+
+    def retrieve_memories(self, current_time: datetime, query: str, top_k: int = 3, exact: bool = False) -> List[Memory]:
+        if len(self) == 0 or top_k <= 0: return []
+        return self.retrieve_by_embedding(current_time, get_embedding(query), top_k, exact)
+
+    def retrieve_by_embedding(self, current_time: datetime, query_embedding: np.ndarray, top_k: int = 3,
+                              exact: bool = False) -> List[Memory]:
+        """top_k memori dengan skor tertinggi; exact=True selalu scan penuh meskipun indeks ANN aktif."""
+        n = len(self)
+        if n == 0 or top_k <= 0: return []
+        query_embedding = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query_norm = np.linalg.norm(query_embedding)
+        if query_norm > 0: query_embedding = query_embedding / query_norm
+        now = _to_micros(current_time)
+        if self._ann is not None and not exact:
+            return self._retrieve_candidates(query_embedding, now, top_k)
+        scores = self._score(self._embeddings[:self._size], self._timestamps[:self._size], self._importances[:self._size], query_embedding, now)
+        seq = self._seq[:self._size]
+        if self._cold and self._cold.size:
+            c, m = self._cold, self._cold.size
+            scores = np.concatenate([scores, self._score(c.embeddings[:m], c.timestamps[:m], c.importances[:m], query_embedding, now)])
+            seq = np.concatenate([seq, c.seq[:m]])
+        order = self._top_k(scores, seq, top_k)
+        return [self._materialize(0, i) if i < self._size else self._materialize(1, i - self._size) for i in order]
+
+    def _retrieve_candidates(self, query_embedding: np.ndarray, now_micros: int, top_k: int) -> List[Memory]:
+        """Seperti scan penuh, tetapi hanya atas kandidat relevansi dari IVF + memori terbaru."""
+        recent = np.arange(max(0, self._next_seq - self._ANN_RECENT), self._next_seq)
+        candidates = np.union1d(self._ann.search(query_embedding, self.ann_probe), recent)
+        tiers, rows = self._seq_tier[candidates], self._seq_row[candidates]
+        hot, cold = tiers == 0, tiers == 1
+        hot_rows, cold_rows = rows[hot], rows[cold]
+        scores = self._score(self._embeddings[hot_rows], self._timestamps[hot_rows], self._importances[hot_rows], query_embedding, now_micros)
+        if len(cold_rows):
+            c = self._cold
+            scores = np.concatenate([scores, self._score(c.embeddings[cold_rows], c.timestamps[cold_rows],
+                                                         c.importances[cold_rows], query_embedding, now_micros)])
+        seq = np.concatenate([candidates[hot], candidates[cold]])
+        order = self._top_k(scores, seq, top_k)
+        return [self._materialize(0, hot_rows[i]) if i < len(hot_rows) else self._materialize(1, cold_rows[i - len(hot_rows)])
+                for i in order]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, seq: np.ndarray, top_k: int) -> np.ndarray:
+        n = len(scores)
+        k = min(top_k, n)
+        if k < n:
+            # Ambil semua kandidat yang skornya >= skor ke-k agar hasil seri tetap konsisten
+            kth_score = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            candidates = np.flatnonzero(scores >= kth_score)
+        else:
+            candidates = np.arange(n)
+        # Urutkan skor menurun; jika seri, memori yang lebih lama didahulukan (seperti sort stabil)
+        return candidates[np.lexsort((seq[candidates], -scores[candidates]))][:k]
+
+    def ann_stats(self) -> Optional[dict]:
+        return self._ann.stats() if self._ann is not None else None
+
+    def close(self):
+        if self._ann_builder is not None:
+            self._ann_cancel.set()
+            self._ann_builder.join()
+            self._ann_builder = None
+        if self._cold is not None:
+            self._cold.close()
+            self._cold = None
 
 # --- PERUBAHAN BESAR PADA KELAS AGENT DAN PENAMBAHAN KELAS ENVIRONMENT ---
 class Agent:
-    def __init__(self, name: str, description: str, location: str):
+    def __init__(self, name: str, description: str, location: str, memory_stream: Optional[MemoryStream] = None):
         self.name = name
         self.description = description
-        self.memory_stream = MemoryStream()
+        # memory_stream bisa diisi MemoryStream dengan anggaran RAM / embedding float16 sendiri
+        self.memory_stream = memory_stream if memory_stream is not None else MemoryStream()
+        self._env: Optional['Environment'] = None  # diisi Environment.add_agent
         
         # Atribut Status
         self.location = location
@@ -62,27 +504,85 @@ class Agent:
         self.daily_plan: Dict[str, str] = {}
         self.cumulative_importance_since_reflection = 0
         self.reflection_threshold = 50
+        # Anggaran token (perkiraan) untuk memori relevan di prompt keputusan
+        self.memory_token_budget = DEFAULT_MEMORY_TOKEN_BUDGET
+
+    # Lokasi dan status memberi tahu Environment agar indeks lokasi & cache observasi tetap mutakhir
+    @property
+    def location(self) -> str: return self._location
+
+    @location.setter
+    def location(self, new_location: str):
+        old_location = getattr(self, '_location', None)
+        self._location = new_location
+        if self._env is not None and old_location != new_location:
+            self._env._on_agent_moved(self, old_location, new_location)
+
+    @property
+    def status(self) -> str: return self._status
+
+    @status.setter
+    def status(self, new_status: str):
+        old_status = getattr(self, '_status', None)
+        self._status = new_status
+        # apply_action menulis ulang status setiap tick; cache lokasi hanya dibuang jika teksnya berubah
+        if self._env is not None and old_status != new_status:
+            self._env._invalidate_location(self._location)
 
     def observe(self, description: str):
-        self.cumulative_importance_since_reflection = self.memory_stream.add_memory(description)
-        if self.cumulative_importance_since_reflection >= self.reflection_threshold: self.reflect()
+        with metrics.span("observe", agent=self.name):
+            self.cumulative_importance_since_reflection = self.memory_stream.add_memory(description)
+        self._maybe_reflect()
+
+    def observe_precomputed(self, memory: Memory):
+        """Seperti observe(), untuk Memory yang skor dan embedding-nya sudah dihitung (mis. event massal)."""
+        self.cumulative_importance_since_reflection = self.memory_stream.add_precomputed(memory)
+        self._maybe_reflect()
+
+    def _maybe_reflect(self):
+        if self.cumulative_importance_since_reflection >= self.reflection_threshold:
+            pipeline = self._env.reflection_pipeline if self._env is not None else None
+            if pipeline is not None: self.reflect_in_background(pipeline)
+            else: self.reflect()
+
+    def _recent_memories_text(self) -> str:
+        return "\n".join([f"- {m.description}" for m in self.memory_stream.recent(50)])
 
     def reflect(self):
         # ... (Sama seperti sebelumnya)
         print(f"\n[KOGNISI] {self.name} memulai refleksi...")
         self.cumulative_importance_since_reflection = 0
-        recent_memories = self.memory_stream.memories[-50:]
-        memories_text = "\n".join([f"- {m.description}" for m in recent_memories])
-        reflection = generate_reflection(memories_text)
-        if reflection and "gagal" not in reflection.lower():
-            self.memory_stream.add_memory(reflection, is_reflection=True)
+        with metrics.span("reflect", agent=self.name):
+            reflection = generate_reflection(self._recent_memories_text())
+            if reflection and "gagal" not in reflection.lower():
+                self.memory_stream.add_memory(reflection, is_reflection=True)
+
+    def reflect_in_background(self, pipeline):
+        """Mengantrekan refleksi ke ReflectionPipeline; hasilnya masuk ke memori di batas tick berikutnya."""
+        priority = self.cumulative_importance_since_reflection
+        self.cumulative_importance_since_reflection = 0
+        if pipeline.submit(self, self._recent_memories_text(), priority, self._env.current_time):
+            print(f"\n[KOGNISI] {self.name} mengantrekan refleksi (prioritas {priority})...")
+
+    def compose_reflection(self, memories_text: str) -> Optional[Memory]:
+        """Dijalankan di thread pekerja refleksi: LLM refleksi + importance + embedding, tanpa menyentuh MemoryStream."""
+        with metrics.span("reflect", agent=self.name):
+            reflection = generate_reflection(memories_text)
+            if reflection and "gagal" not in reflection.lower():
+                return Memory(clock(), reflection, is_reflection=True)
+        return None
+
+    def merge_reflection(self, memory: Memory):
+        self.memory_stream.add_precomputed(memory, is_reflection=True)
+        print(f"    -> REFLEKSI: '{memory.description}' (imp: {memory.importance})")
 
     def plan_day(self):
         # ... (Sama seperti sebelumnya)
         print(f"\n[KOGNISI] {self.name} memulai perencanaan harian...")
-        relevant_memories = self.memory_stream.retrieve_memories(datetime.now(), query=f"tujuan hidup {self.name}", top_k=5)
-        agent_summary = f"Nama: {self.name}\nDeskripsi: {self.description}\n\nWawasan Penting:\n" + "\n".join([f"- {m.description}" for m in relevant_memories])
-        plan_text = generate_daily_plan(agent_summary)
+        with metrics.span("plan_day", agent=self.name):
+            relevant_memories = self.memory_stream.retrieve_memories(clock(), query=f"tujuan hidup {self.name}", top_k=5)
+            agent_summary = f"Nama: {self.name}\nDeskripsi: {self.description}\n\nWawasan Penting:\n" + "\n".join([f"- {m.description}" for m in relevant_memories])
+            plan_text = generate_daily_plan(agent_summary)
         self.daily_plan = {}
         for line in plan_text.split('\n'):
             if '-' in line:
@@ -90,72 +590,283 @@ class Agent:
                 except ValueError: continue
         print(f"  -> Rencana untuk {self.name} dibuat.")
 
-    # BARU: Metode act() untuk menjalankan siklus aksi
-    def act(self, env: 'Environment'):
-        # 1. Dapatkan konteks waktu dan rencana
-        current_time_str = env.current_time.strftime("%H:%M")
+    def current_plan_activity(self, current_time_str: str) -> str:
         plan_activity = "Tidak ada dalam rencana"
         for plan_time, activity in self.daily_plan.items():
             if plan_time <= current_time_str:
                 plan_activity = activity
+        return plan_activity
+
+    def current_plan_slot(self, current_time_str: str) -> Tuple[Optional[str], str]:
+        """(jam mulai, aktivitas) dari slot rencana yang sedang berlaku; dipakai TickScheduler."""
+        slot = (None, "Tidak ada dalam rencana")
+        for plan_time, activity in self.daily_plan.items():
+            if plan_time <= current_time_str:
+                slot = (plan_time, activity)
+        return slot
+
+    @staticmethod
+    def retrieval_query(current_time_str: str, plan_activity: str, observation: str) -> str:
+        return f"Waktu sekarang {current_time_str}. Rencana: {plan_activity}. Pengamatan: {observation}"
+
+    def expected_embedding_texts(self, world) -> List[str]:
+        """Teks yang kemungkinan besar akan di-embed oleh act() pada step ini (untuk prefetch)."""
+        current_time_str = world.current_time.strftime("%H:%M")
+        observation = world.get_observations_for(self)
+        plan_slot = self.current_plan_slot(current_time_str)
+        if world.scheduler.trigger_reason(self, world.current_time, observation, plan_slot) is None:
+            return [observation]
+        return [observation, self.retrieval_query(current_time_str, plan_slot[1], observation)]
+
+    # BARU: Metode act() untuk menjalankan siklus aksi
+    def act(self, env: 'Environment'):
+        with metrics.span("act", agent=self.name):
+            new_location, new_status = self.decide(env)
+            self.apply_action(new_location, new_status, env.current_time.strftime("%H:%M"))
+
+    def decide(self, world) -> Tuple[Optional[str], str]:
+        """
+        Siklus kognisi (amati, ingat, putuskan) tanpa mengubah lokasi/status agen.
+        `world` bisa berupa Environment atau WorldSnapshot. Mengembalikan (lokasi baru, status baru);
+        lokasi None berarti agen tidak pindah.
+        """
+        # 1. Dapatkan konteks waktu dan rencana
+        current_time_str = world.current_time.strftime("%H:%M")
+        plan_slot = self.current_plan_slot(current_time_str)
+        plan_activity = plan_slot[1]
 
         # 2. Amati lingkungan
-        observation = env.get_observations_for(self)
+        observation = world.get_observations_for(self)
         self.observe(observation)
 
+        # Tanpa pemicu (mode event_driven), lewati retrieval dan panggilan LLM: tetap di tempat
+        if not world.scheduler.should_decide(self, world.current_time, observation, plan_slot):
+            return None, self.status
+
         # 3. Ambil memori yang relevan
-        query = f"Waktu sekarang {current_time_str}. Rencana: {plan_activity}. Pengamatan: {observation}"
-        relevant_memories = self.memory_stream.retrieve_memories(env.current_time, query, top_k=3)
-        memories_str = "\n".join([f"- {m.description}" for m in relevant_memories])
-
-        # 4. Bangun prompt konteks penuh untuk LLM
-        context = f"""Anda adalah {self.name}. Identitas Anda: {self.description}.
-        Lokasi saat ini: {self.location}.
-        Waktu: {current_time_str}.
-        Status saat ini: {self.status}.
-        Rencana Anda untuk saat ini adalah: "{plan_activity}".
-        Anda baru saja mengamati: "{observation}".
-        Memori yang relevan dengan situasi ini:
-        {memories_str}
-        """
+        with metrics.span("retrieve", agent=self.name):
+            query = self.retrieval_query(current_time_str, plan_activity, observation)
+            relevant_memories = self.memory_stream.retrieve_memories(world.current_time, query, top_k=3)
+
+        # 4. Bangun prompt konteks: bagian stabil di depan, yang berubah tiap tick di belakang
+        context = decision_context(self.name, self.description, plan_activity, self.location, self.status,
+                                   [m.description for m in relevant_memories], observation, current_time_str,
+                                   memory_token_budget=self.memory_token_budget)
+
         # 5. Putuskan tindakan
-        action_str = decide_next_action(context)
+        with metrics.span("decide", agent=self.name):
+            action_str = decide_next_action(context)
 
-        # 6. Parse dan eksekusi tindakan
+        # 6. Parse tindakan
         try:
             new_location, new_status = action_str.split('::', 1)
-            self.location = new_location.strip()
-            self.status = new_status.strip()
+            new_location, new_status = new_location.strip(), new_status.strip()
         except ValueError:
             # Jika format salah, jangan pindah lokasi
-            self.status = action_str.strip()
-        
+            new_location, new_status = None, action_str.strip()
+        world.scheduler.record_decision(self, world.current_time, observation, plan_slot,
+                                        (new_location if new_location is not None else self.location, new_status))
+        return new_location, new_status
+
+    def apply_action(self, new_location: Optional[str], new_status: str, current_time_str: str):
+        if new_location is not None:
+            self.location = new_location
+        self.status = new_status
         print(f"[{current_time_str}] {self.name} @ {self.location} -> {self.status}")
 
+class AgentView(NamedTuple):
+    agent: Agent
+    name: str
+    location: str
+    status: str
+
+def _observation_text(location: str, entries: List[Tuple[Agent, str]], observer: Agent) -> str:
+    """entries: (agen, "Nama (status: ...)") untuk semua agen di lokasi, sesuai urutan Environment.agents."""
+    others = [text for agent, text in entries if agent is not observer]
+    if not others:
+        return f"sendirian di {location}."
+    return f"melihat {', '.join(others)} di {location}."
+
+class WorldSnapshot:
+    """Potret beku dunia di awal tick; dipakai semua agen saat berpikir secara paralel."""
+    def __init__(self, current_time: datetime, agents: List[Agent], scheduler: TickScheduler):
+        self.current_time = current_time
+        self.scheduler = scheduler
+        self.agents = tuple(AgentView(a, a.name, a.location, a.status) for a in agents)
+        self._location = {view.agent: view.location for view in self.agents}
+        # Indeks lokasi dibangun sekali per tick; teks status tiap agen juga hanya dibuat sekali
+        self._entries: Dict[str, List[Tuple[Agent, str]]] = {}
+        for view in self.agents:
+            self._entries.setdefault(view.location, []).append((view.agent, f"{view.name} (status: {view.status})"))
+
+    def get_observations_for(self, agent: Agent) -> str:
+        location = self._location[agent]
+        return _observation_text(location, self._entries[location], agent)
+
 # BARU: Kelas Environment untuk mengelola simulasi
 class Environment:
-    def __init__(self, start_time_str="08:00"):
-        self.start_time = datetime.now().replace(hour=int(start_time_str.split(':')[0]), minute=int(start_time_str.split(':')[1]), second=0)
+    STEP_MODES = ("sequential", "concurrent")
+
+    REFLECTION_MODES = ("inline", "background")
+
+    def __init__(self, start_time_str="08:00", step_mode: str = "sequential", max_workers: int = 8,
+                 reflection_mode: str = "inline", reflection_workers: int = 2,
+                 scheduler: str = "every_tick", max_idle_minutes: int = 15,
+                 batch_importance: Optional[bool] = None):
+        """
+        step_mode="sequential": agen bertindak bergantian dan melihat perubahan agen sebelumnya.
+        step_mode="concurrent": semua agen berpikir paralel (thread pool berukuran max_workers)
+        di atas WorldSnapshot awal tick; hasilnya diterapkan sekaligus di akhir tick.
+        reflection_mode="background": refleksi dikerjakan ReflectionPipeline (reflection_workers thread)
+        dan digabungkan ke memori di awal tick berikutnya, bukan di tengah act().
+        scheduler="event_driven": agen hanya memanggil LLM untuk memutuskan jika observasi, slot rencana,
+        atau peristiwa eksternal berubah, atau setelah max_idle_minutes menit tanpa keputusan (lihat TickScheduler).
+        batch_importance=True: observasi semua agen di awal tick dinilai dalam satu prompt bernomor
+        (get_importance_scores) sehingga observe() cukup membaca cache skor. Default (None) hanya aktif
+        untuk step_mode="concurrent": di mode sequential observasi memuat status agen lain yang sebagian
+        besar berubah sebelum agen sempat mengamati, sehingga skor massal itu terbuang.
+        """
+        if step_mode not in self.STEP_MODES:
+            raise ValueError(f"step_mode harus salah satu dari {self.STEP_MODES}, bukan '{step_mode}'")
+        if reflection_mode not in self.REFLECTION_MODES:
+            raise ValueError(f"reflection_mode harus salah satu dari {self.REFLECTION_MODES}, bukan '{reflection_mode}'")
+        self.scheduler = TickScheduler(scheduler, max_idle_minutes=max_idle_minutes)
+        self.reflection_mode = reflection_mode
+        self.reflection_pipeline = ReflectionPipeline(max_workers=reflection_workers) if reflection_mode == "background" else None
+        self.start_time = clock().replace(hour=int(start_time_str.split(':')[0]), minute=int(start_time_str.split(':')[1]), second=0)
         self.current_time = self.start_time
         self.agents: List[Agent] = []
+        self.step_mode = step_mode
+        self.max_workers = max_workers
+        self.batch_importance = step_mode == "concurrent" if batch_importance is None else batch_importance
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Indeks lokasi -> agen, diperbarui setiap kali Agent.location berubah
+        self._agent_order: Dict[Agent, int] = {}
+        self._agents_at: Dict[str, set] = {}
+        # Cache (agen, teks status) per lokasi; dibuang saat ada agen yang masuk/keluar/berganti status
+        self._location_entries: Dict[str, List[Tuple[Agent, str]]] = {}
 
     def add_agent(self, agent: Agent):
         self.agents.append(agent)
+        self._agent_order[agent] = len(self._agent_order)
+        agent._env = self
+        self._on_agent_moved(agent, None, agent.location)
+
+    def _on_agent_moved(self, agent: Agent, old_location: Optional[str], new_location: str):
+        if old_location is not None:
+            self._agents_at.get(old_location, set()).discard(agent)
+            self._invalidate_location(old_location)
+        self._agents_at.setdefault(new_location, set()).add(agent)
+        self._invalidate_location(new_location)
+
+    def _invalidate_location(self, location: str):
+        self._location_entries.pop(location, None)
+
+    def agents_at(self, location: str) -> List[Agent]:
+        return sorted(self._agents_at.get(location, ()), key=self._agent_order.__getitem__)
 
     def get_observations_for(self, agent: Agent) -> str:
         """Menghasilkan observasi sederhana berdasarkan lokasi."""
-        other_agents = [a for a in self.agents if a != agent and a.location == agent.location]
-        if not other_agents:
-            return f"sendirian di {agent.location}."
-        else:
-            names = ", ".join([f"{a.name} (status: {a.status})" for a in other_agents])
-            return f"melihat {names} di {agent.location}."
+        entries = self._location_entries.get(agent.location)
+        if entries is None:
+            entries = [(a, f"{a.name} (status: {a.status})") for a in self.agents_at(agent.location)]
+            self._location_entries[agent.location] = entries
+        return _observation_text(agent.location, entries, agent)
+
+    def prepare_events(self, events: Sequence[dict]) -> List[Tuple[Memory, dict]]:
+        """
+        events: {"description": str, "location": opsional, "agents": opsional [nama agen]}.
+        Skor kepentingan dan embedding dihitung sekali per teks unik, bukan sekali per agen penerima.
+        Tidak menyentuh state dunia, jadi boleh dipanggil dari luar thread simulasi.
+        """
+        texts = [f"Sebuah peristiwa tak terduga terjadi: {event['description']}" for event in events]
+        unique_texts = list(dict.fromkeys(texts))
+        embeddings = embedding_service.encode_many(unique_texts)
+        now = clock()
+        scores = get_importance_scores(unique_texts)
+        memories = {text: Memory.precomputed(now, text, score, embedding)
+                    for text, score, embedding in zip(unique_texts, scores, embeddings)}
+        metrics.events_ingested.inc(len(events))
+        return [(memories[text], event) for text, event in zip(texts, events)]
+
+    def event_targets(self, event: dict) -> List[Agent]:
+        """Penerima event: semua agen, dipersempit oleh "agents" (nama) dan/atau "location" jika ada."""
+        targets = self.agents_at(event["location"]) if event.get("location") else list(self.agents)
+        if event.get("agents"):
+            names = set(event["agents"])
+            targets = [agent for agent in targets if agent.name in names]
+        return targets
+
+    def deliver_events(self, prepared: Sequence[Tuple[Memory, dict]]) -> int:
+        """Menyebarkan Memory hasil prepare_events ke aliran memori setiap penerima; mengembalikan jumlah pengiriman."""
+        delivered = 0
+        for memory, event in prepared:
+            targets = self.event_targets(event)
+            for agent in targets:
+                agent.observe_precomputed(memory)
+                self.scheduler.notify_event(agent)
+            delivered += len(targets)
+            print(f"    -> Event: '{memory.description}' (imp: {memory.importance}) ke {len(targets)} agen")
+        metrics.event_deliveries.inc(delivered)
+        return delivered
+
+    def broadcast_event(self, event_description: str):
+        """Peristiwa eksternal: semua agen mengamatinya dan akan memutuskan ulang pada tick berikutnya."""
+        self.deliver_events(self.prepare_events([{"description": event_description}]))
+
+    def snapshot(self) -> WorldSnapshot:
+        return WorldSnapshot(self.current_time, self.agents, self.scheduler)
 
     def run_step(self):
         """Menjalankan satu langkah simulasi untuk semua agen."""
+        with metrics.span("tick", time=self.current_time.strftime("%H:%M")):
+            if self.reflection_pipeline is not None:
+                # Batas tick: refleksi yang sudah selesai masuk ke memori sebelum agen bertindak
+                self.reflection_pipeline.merge_completed(self.current_time)
+            if self.step_mode == "concurrent":
+                self._run_step_concurrent()
+            else:
+                self._run_step_sequential()
+        self.current_time += timedelta(minutes=1)
+
+    def _prefetch(self, world):
+        """
+        Kumpulkan semua teks yang akan di-embed dan semua observasi yang akan dinilai pada step ini,
+        lalu encode dalam satu batch dan nilai dalam satu prompt (jika batch_importance). Jika agen lain
+        berpindah di tengah step (mode sequential), teks yang berubah cukup di-encode dan dinilai terpisah.
+        """
+        embedding_service.prefetch([text for agent in self.agents for text in agent.expected_embedding_texts(world)])
+        if self.batch_importance:
+            with metrics.span("score_batch"):
+                get_importance_scores(list(dict.fromkeys(world.get_observations_for(agent) for agent in self.agents)))
+
+    def _run_step_sequential(self):
+        self._prefetch(self)
         for agent in self.agents:
             agent.act(self)
-        self.current_time += timedelta(minutes=1)
+
+    def _run_step_concurrent(self):
+        world = self.snapshot()
+        self._prefetch(world)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent")
+        # map() mengembalikan hasil sesuai urutan agen, bukan urutan selesai, sehingga deterministik
+        decisions = list(self._executor.map(lambda agent: agent.decide(world), self.agents))
+        current_time_str = world.current_time.strftime("%H:%M")
+        for agent, (new_location, new_status) in zip(self.agents, decisions):
+            agent.apply_action(new_location, new_status, current_time_str)
+
+    def shutdown(self):
+        """Menghentikan thread pekerja dan menutup aliran memori (file sementara tingkat dingin ikut dihapus)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.reflection_pipeline is not None:
+            self.reflection_pipeline.shutdown(wait=True)
+            self.reflection_pipeline.merge_completed(self.current_time)
+            self.reflection_pipeline = None
+        for agent in self.agents:
+            agent.memory_stream.close()
 
 # --- CONTOH SIMULASI LENGKAP ---
 if __name__ == "__main__":
@@ -0,0 +1,228 @@
+# file: simulation_runner.py
+
+import asyncio
+import json
+import queue
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from checkpoint import save_checkpoint
+from llm_backend import ReplayMissError
+from simulation_core import Environment
+
+
+class StateSnapshot:
+    """
+    Status simulasi yang tidak diubah lagi setelah dipublikasikan (aman dibaca dari thread mana pun).
+    ETag memuat instance_id runner, karena version mulai lagi dari 1 setiap kali runner dibuat
+    (restart server, pemulihan checkpoint, dunia dihapus lalu dibuat ulang dengan id yang sama).
+    """
+    __slots__ = ("instance_id", "version", "simulation_time", "agents", "body", "etag")
+
+    def __init__(self, version: int, simulation_time: str, agents: Tuple[Tuple[str, str, str], ...], instance_id: str = ""):
+        self.instance_id = instance_id
+        self.version = version
+        self.simulation_time = simulation_time
+        self.agents = agents  # tuple (name, location, status)
+        self.body = json.dumps(self.to_dict()).encode("utf-8")
+        self.etag = f'"{instance_id}-{version}"'
+
+    def to_dict(self) -> dict:
+        return {
+            "simulation_time": self.simulation_time,
+            "agents": [{"name": n, "location": l, "status": s} for n, l, s in self.agents],
+        }
+
+    def delta_from(self, previous: Optional["StateSnapshot"]) -> dict:
+        """Hanya agen yang berubah (atau hilang) sejak snapshot sebelumnya."""
+        before: Dict[str, Tuple[str, str, str]] = {a[0]: a for a in previous.agents} if previous else {}
+        changed = [a for a in self.agents if before.get(a[0]) != a]
+        current_names = {a[0] for a in self.agents}
+        return {
+            "version": self.version,
+            "simulation_time": self.simulation_time,
+            "agents": [{"name": n, "location": l, "status": s} for n, l, s in changed],
+            "removed": [name for name in before if name not in current_names],
+        }
+
+
+class SimulationRunner:
+    """
+    Menjalankan Environment.run_step() di thread tersendiri agar event loop FastAPI tetap
+    responsif. Setelah setiap tick, status dipublikasikan sebagai StateSnapshot dan delta-nya
+    dikirim ke semua pelanggan (misalnya koneksi SSE).
+    """
+    def __init__(self, env: Environment, step_interval: float = 1.0, checkpoint_path: Optional[str] = None,
+                 checkpoint_every: int = 60, setup: Optional[Callable[[Environment], None]] = None):
+        """
+        Jika checkpoint_path diisi, checkpoint inkremental ditulis setiap checkpoint_every tick dan saat stop().
+        setup(env), jika ada, dijalankan sekali di thread simulasi sebelum tick pertama (mis. plan_day
+        yang memanggil LLM), sehingga pembuat runner tidak ikut menunggu.
+        """
+        self.env = env
+        self.step_interval = step_interval
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self._setup = setup
+        self._steps = 0
+        # Event disiapkan (importance + embedding) di thread ingest, lalu disebar di batas tick
+        self._events: "queue.Queue[list]" = queue.Queue()
+        self._ingest = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-ingest")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._subscribers_lock = threading.Lock()
+        self._listeners: List[Callable[[StateSnapshot], None]] = []
+        self.paused = False
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._version = 0
+        self._snapshot = self._capture()
+
+    @property
+    def snapshot(self) -> StateSnapshot:
+        return self._snapshot
+
+    def _capture(self) -> StateSnapshot:
+        self._version += 1
+        return StateSnapshot(
+            self._version,
+            self.env.current_time.strftime("%Y-%m-%d %H:%M"),
+            tuple((a.name, a.location, a.status) for a in self.env.agents),
+            self.instance_id,
+        )
+
+    def submit_event(self, event_description: str):
+        """Event eksternal diantrekan dan diterapkan oleh thread simulasi sebelum tick berikutnya."""
+        self.submit_events([{"description": event_description}])
+
+    def submit_events(self, events: List[dict]) -> Future:
+        """
+        Sekumpulan event (lihat Environment.prepare_events) langsung diterima; skor dan embedding
+        dihitung di thread ingest (satu thread, jadi urutan batch terjaga) dan hasilnya disebar ke
+        agen penerima oleh thread simulasi sebelum tick berikutnya.
+        """
+        return self._ingest.submit(self._prepare_events, events)
+
+    def _prepare_events(self, events: List[dict]):
+        try:
+            self._events.put(self.env.prepare_events(events))
+        except ReplayMissError:
+            raise
+        except Exception as e:
+            print(f"Error saat menyiapkan event: {e}")
+
+    def _apply_pending_events(self):
+        while True:
+            try:
+                prepared = self._events.get_nowait()
+            except queue.Empty:
+                return
+            self.env.deliver_events(prepared)
+
+    def _publish(self):
+        previous, self._snapshot = self._snapshot, self._capture()
+        delta = self._snapshot.delta_from(previous)
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for loop, subscriber_queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, subscriber_queue, delta)
+        for listener in self._listeners:
+            listener(self._snapshot)
+
+    def _offer(self, subscriber_queue: asyncio.Queue, delta: dict):
+        try:
+            subscriber_queue.put_nowait(("delta", delta))
+        except asyncio.QueueFull:
+            # Pelanggan terlalu lambat: buang delta yang tertunda dan kirim status penuh sebagai gantinya
+            while not subscriber_queue.empty():
+                subscriber_queue.get_nowait()
+            subscriber_queue.put_nowait(("snapshot", self._snapshot.to_dict()))
+
+    def subscribe(self, maxsize: int = 100) -> asyncio.Queue:
+        """Dipanggil dari dalam event loop; mengembalikan antrean berisi (jenis, payload)."""
+        subscriber_queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        with self._subscribers_lock:
+            self._subscribers.append((asyncio.get_running_loop(), subscriber_queue))
+        return subscriber_queue
+
+    def unsubscribe(self, subscriber_queue: asyncio.Queue):
+        with self._subscribers_lock:
+            self._subscribers = [s for s in self._subscribers if s[1] is not subscriber_queue]
+
+    def add_listener(self, listener: Callable[[StateSnapshot], None]):
+        """listener(snapshot) dipanggil dari thread simulasi setelah setiap tick; harus cepat."""
+        self._listeners.append(listener)
+
+    def pause(self):
+        """Menghentikan tick sementara; event yang masuk tetap diantrekan."""
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def _loop(self):
+        if self._setup is not None:
+            try:
+                self._setup(self.env)
+            except ReplayMissError as e:
+                self._replay_diverged(e)
+                return
+            except Exception as e:
+                print(f"Error saat menyiapkan simulasi: {e}")
+            self._setup = None
+            self._publish()
+        while not self._stop.is_set():
+            if self.paused:
+                self._stop.wait(self.step_interval)
+                continue
+            try:
+                self._apply_pending_events()
+                self.env.run_step()
+            except ReplayMissError as e:
+                self._replay_diverged(e)
+                return
+            except Exception as e:
+                print(f"Error pada step simulasi: {e}")
+            self._steps += 1
+            self._publish()
+            if self.checkpoint_path and self._steps % self.checkpoint_every == 0:
+                self.checkpoint()
+            self._stop.wait(self.step_interval)
+
+    def _replay_diverged(self, error: ReplayMissError):
+        # Replay yang menyimpang dari rekaman tidak lagi bermakna; hentikan loop alih-alih melanjutkan dengan nilai cadangan
+        print(f"Replay LLM menyimpang dari rekaman, simulasi dihentikan: {error}")
+        self._stop.set()
+        self._publish()
+
+    def start(self):
+        if self._thread is not None: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="simulation", daemon=True)
+        self._thread.start()
+
+    def checkpoint(self):
+        """Dipanggil dari thread simulasi (atau setelah thread berhenti) agar state konsisten."""
+        try:
+            result = save_checkpoint(self.env, self.checkpoint_path)
+            print(f"Checkpoint: {result['memories_written']} memori baru ditulis dalam {result['seconds']:.2f} detik.")
+        except Exception as e:
+            print(f"Error saat menulis checkpoint: {e}")
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """Menghentikan thread simulasi; False jika thread belum berhenti dalam timeout."""
+        self._stop.set()
+        stopped = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+            stopped = not self._thread.is_alive()
+            self._thread = None
+            if stopped:
+                # Event yang sudah diterima tetap masuk ke memori sebelum checkpoint terakhir
+                self._ingest.shutdown(wait=True)
+                self._apply_pending_events()
+                if self.checkpoint_path:
+                    self.checkpoint()
+        return stopped
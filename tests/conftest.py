@@ -0,0 +1,11 @@
+# file: tests/conftest.py
+
+import os
+import sys
+
+# Tanpa model embedding, tanpa cache skor di disk, dan tanpa Ollama: modul dibaca saat impor pertama
+os.environ.setdefault("EMBEDDING_BACKEND", "hash")
+os.environ["IMPORTANCE_CACHE_PATH"] = ""
+os.environ.setdefault("LLM_BACKEND", "live")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,96 @@
+# file: tests/test_checkpoint.py
+
+import json
+import os
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+import checkpoint
+from benchmark import build_environment
+from checkpoint import load_checkpoint, save_checkpoint
+from simulation_core import Memory
+
+
+def add_memories(env, count, reflection_every=7):
+    encoder_dim = env.agents[0].memory_stream.embedding_dim
+    rng = np.random.default_rng(len(env.agents[0].memory_stream))
+    for agent in env.agents:
+        for i in range(count):
+            embedding = rng.standard_normal(encoder_dim).astype(np.float32)
+            memory = Memory.precomputed(env.current_time + timedelta(seconds=i), f"{agent.name} baru {i}",
+                                        int(rng.integers(1, 11)), embedding / np.linalg.norm(embedding))
+            agent.memory_stream.add_precomputed(memory, is_reflection=i % reflection_every == 0)
+    env.current_time += timedelta(minutes=count)
+
+
+def assert_same_world(original, restored):
+    assert restored.current_time == original.current_time
+    assert restored.start_time == original.start_time
+    assert restored.step_mode == original.step_mode
+    assert restored.batch_importance == original.batch_importance
+    assert [a.name for a in restored.agents] == [a.name for a in original.agents]
+    for before, after in zip(original.agents, restored.agents):
+        assert (after.location, after.status, after.daily_plan) == (before.location, before.status, before.daily_plan)
+        assert after.cumulative_importance_since_reflection == before.cumulative_importance_since_reflection
+        assert after.memory_stream.stream_id == before.memory_stream.stream_id
+        assert after.memory_stream.next_seq == before.memory_stream.next_seq
+        expected, actual = before.memory_stream.export_since(0), after.memory_stream.export_since(0)
+        assert actual["descriptions"] == expected["descriptions"]
+        for key in ("embeddings", "timestamps", "importances", "seq", "is_reflection"):
+            assert actual[key].dtype == expected[key].dtype
+            np.testing.assert_array_equal(actual[key], expected[key])
+
+
+@pytest.fixture
+def env():
+    world = build_environment(n_agents=3, n_memories=40, n_locations=2, step_mode="concurrent")
+    world.agents[0].status = "Sedang menempa pedang"
+    world.agents[1].cumulative_importance_since_reflection = 17
+    yield world
+    world.shutdown()
+
+
+def test_full_round_trip(env, tmp_path):
+    result = save_checkpoint(env, str(tmp_path))
+    assert result["memories_written"] == 3 * 40
+    restored = load_checkpoint(str(tmp_path))
+    assert_same_world(env, restored)
+    restored.shutdown()
+
+
+def test_incremental_round_trip_writes_only_new_memories(env, tmp_path):
+    save_checkpoint(env, str(tmp_path))
+    add_memories(env, 5)
+    assert save_checkpoint(env, str(tmp_path))["memories_written"] == 3 * 5
+    assert save_checkpoint(env, str(tmp_path))["memories_written"] == 0
+    restored = load_checkpoint(str(tmp_path))
+    assert_same_world(env, restored)
+    restored.shutdown()
+
+
+def test_compaction_rewrites_agent_directory(env, tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "COMPACT_AFTER_SEGMENTS", 3)
+    save_checkpoint(env, str(tmp_path))
+    first_dirs = {a["dir"] for a in json.load(open(tmp_path / "manifest.json"))["agents"]}
+    for _ in range(3):
+        add_memories(env, 2)
+        save_checkpoint(env, str(tmp_path))
+    manifest = json.load(open(tmp_path / "manifest.json"))
+    assert {a["dir"] for a in manifest["agents"]}.isdisjoint(first_dirs)
+    assert all(len(a["memory"]["segments"]) == 1 for a in manifest["agents"])
+    assert sorted(os.listdir(tmp_path / "agents")) == sorted(a["dir"] for a in manifest["agents"])
+    restored = load_checkpoint(str(tmp_path))
+    assert_same_world(env, restored)
+    restored.shutdown()
+
+
+def test_cold_tier_round_trip(tmp_path):
+    world = build_environment(n_agents=2, n_memories=3000, n_locations=2, ram_budget_mb=0.2)
+    assert world.agents[0].memory_stream._cold is not None
+    save_checkpoint(world, str(tmp_path / "ckpt"))
+    restored = load_checkpoint(str(tmp_path / "ckpt"), cold_dir=str(tmp_path))
+    assert_same_world(world, restored)
+    for agent in world.agents + restored.agents:
+        agent.memory_stream.close()
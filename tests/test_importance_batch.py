@@ -0,0 +1,82 @@
+# file: tests/test_importance_batch.py
+
+import pytest
+
+import ollama_interface
+from benchmark import StubLLMBackend
+from importance_cache import ImportanceCache
+from ollama_interface import (IMPORTANCE_BATCH_PROMPT_VERSION, IMPORTANCE_PROMPT_VERSION, MODEL_NAME,
+                              _parse_batch_scores, get_importance_score, get_importance_scores)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    backend = StubLLMBackend(["Taman"])
+    monkeypatch.setattr(ollama_interface, "backend", backend)
+    monkeypatch.setattr(ollama_interface, "importance_cache", ImportanceCache(path=None))
+    return backend
+
+
+def texts(n):
+    return [f"Mengamati kejadian nomor {i} di taman." for i in range(n)]
+
+
+def test_parse_accepts_common_separators():
+    assert _parse_batch_scores("1: 4\n2. 7\n3) 10\n 4 = 1 \n5-2", 5) == {0: 4, 1: 7, 2: 10, 3: 1, 4: 2}
+
+
+def test_parse_skips_out_of_range_and_malformed_lines():
+    text = "0: 5\n1: 11\n2: tidak yakin\n3: 3 karena penting\n4: 6\n9: 2\nSkor: 8"
+    assert _parse_batch_scores(text, 5) == {3: 6}
+
+
+def test_parse_keeps_first_answer_per_number():
+    assert _parse_batch_scores("1: 4\n1: 9\n2: 2", 2) == {0: 4, 1: 2}
+
+
+def test_batch_scores_match_single_prompt(stub):
+    batch = get_importance_scores(texts(45))
+    # 45 teks -> prompt bernomor 20 + 20 + 5
+    assert stub.calls == 3
+    ollama_interface.importance_cache = ImportanceCache(path=None)
+    assert batch == [get_importance_score(text) for text in texts(45)]
+
+
+def test_duplicates_and_cached_texts_are_not_sent(stub):
+    get_importance_scores(texts(3))
+    calls = stub.calls
+    scores = get_importance_scores(texts(3) + texts(3))
+    assert stub.calls == calls
+    assert len(scores) == 6 and scores[:3] == scores[3:]
+
+
+def test_single_leftover_uses_single_prompt(stub):
+    get_importance_scores(texts(21))
+    cache = ollama_interface.importance_cache
+    assert cache.get(texts(21)[-1], MODEL_NAME, IMPORTANCE_PROMPT_VERSION) is not None
+    assert cache.get(texts(21)[-1], MODEL_NAME, IMPORTANCE_BATCH_PROMPT_VERSION) is None
+    assert cache.get(texts(21)[0], MODEL_NAME, IMPORTANCE_BATCH_PROMPT_VERSION) is not None
+    assert cache.get(texts(21)[0], MODEL_NAME, IMPORTANCE_PROMPT_VERSION) is None
+
+
+def test_malformed_items_fall_back_to_single_prompt(stub):
+    stub.batch_malformed = 0.3
+    batch = get_importance_scores(texts(40))
+    stub.batch_malformed = 0.0
+    ollama_interface.importance_cache = ImportanceCache(path=None)
+    assert batch == [get_importance_score(text) for text in texts(40)]
+
+
+def test_failed_batch_call_falls_back(stub, monkeypatch):
+    original = stub.generate
+
+    def generate(model, prompt, options=None, stop_when=None):
+        if "Skor Kepentingan per nomor" in prompt:
+            raise ConnectionError("server mati")
+        return original(model, prompt, options, stop_when)
+
+    monkeypatch.setattr(stub, "generate", generate)
+    scores = get_importance_scores(texts(4))
+    assert all(1 <= score <= 10 for score in scores)
+    assert all(ollama_interface.importance_cache.get(text, MODEL_NAME, IMPORTANCE_PROMPT_VERSION) is not None
+               for text in texts(4))
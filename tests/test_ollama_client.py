@@ -0,0 +1,73 @@
+# file: tests/test_ollama_client.py
+
+import asyncio
+
+import pytest
+
+from benchmark import StubOllamaServer
+from ollama_client import OllamaClient
+
+
+@pytest.fixture
+def server():
+    stub = StubOllamaServer(prompt_ms_per_char=0.0, token_ms=1.0, verbose_tokens=40).start()
+    yield stub
+    stub.stop()
+
+
+def decision_line(text: str) -> bool:
+    return "\n" in text
+
+
+def test_generate_returns_full_response(server):
+    client = OllamaClient(host=server.host, max_retries=0)
+    response = client.generate("stub", "Tindakan Anda sekarang:", options={"num_predict": 64})
+    assert response["response"].startswith("Bengkel :: Memalu besi panas.")
+    assert "penjelasan" in response["response"]
+    assert client.stats()["successes"] == 1
+    client.close()
+
+
+def test_generate_stops_early(server):
+    client = OllamaClient(host=server.host, max_retries=0)
+    response = client.generate("stub", "Tindakan Anda sekarang:", options={"num_predict": 64}, stop_when=decision_line)
+    assert response["done"] is False
+    assert response["response"].splitlines()[0] == "Bengkel :: Memalu besi panas."
+    assert "penjelasan" not in response["response"]
+    assert client.stats()["early_stops"] == 1
+    client.close()
+
+
+def test_generate_stream_runs_to_done(server):
+    client = OllamaClient(host=server.host, max_retries=0)
+    response = client.generate("stub", "Skor Kepentingan:", options={"num_predict": 1}, stop_when=lambda text: False)
+    assert response == {"response": " 4", "done": True}
+    assert client.stats()["early_stops"] == 0
+    client.close()
+
+
+def test_agenerate_stops_early(server):
+    client = OllamaClient(host=server.host, max_retries=0)
+
+    async def run():
+        return await asyncio.gather(
+            client.agenerate("stub", "Tindakan Anda sekarang:", options={"num_predict": 64}, stop_when=decision_line),
+            client.agenerate("stub", "Skor Kepentingan:", options={"num_predict": 1}),
+        )
+
+    streamed, whole = asyncio.run(run())
+    assert streamed["done"] is False
+    assert streamed["response"].splitlines()[0] == "Bengkel :: Memalu besi panas."
+    assert whole["response"] == " 4"
+    stats = client.stats()
+    assert stats["requests"] == 2 and stats["early_stops"] == 1 and stats["in_flight"] == 0
+    client.close()
+
+
+def test_connection_error_is_counted_as_failure():
+    client = OllamaClient(host="http://127.0.0.1:9", timeout=2.0, max_retries=1, backoff_base=0.0)
+    with pytest.raises(Exception):
+        client.generate("stub", "Skor Kepentingan:")
+    stats = client.stats()
+    assert stats["failures"] == 1 and stats["retries"] == 1
+    client.close()
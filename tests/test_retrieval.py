@@ -0,0 +1,99 @@
+# file: tests/test_retrieval.py
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex
+from simulation_core import Memory, MemoryStream
+
+NOW = datetime(2024, 5, 1, 12, 0)
+
+
+def reference_top_k(memories, query, current_time, top_k):
+    """Implementasi awal berbasis list: skor per memori lalu sort stabil (seri -> memori lebih lama dulu)."""
+    def score(memory):
+        relevance = float(np.dot(memory.embedding, query) / (np.linalg.norm(memory.embedding) * np.linalg.norm(query)))
+        recency = max(0.0, 1.0 - (current_time - memory.timestamp).total_seconds() / (3600 * 24))
+        return 1.5 * relevance + memory.importance / 10 + 0.8 * recency
+    return [m.description for m in sorted(memories, key=score, reverse=True)[:top_k]]
+
+
+def make_memories(n, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((n, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return [Memory.precomputed(NOW - timedelta(minutes=int(rng.integers(0, 3000))), f"memori {i}",
+                               int(rng.integers(1, 11)), embeddings[i]) for i in range(n)]
+
+
+def fill(stream, memories):
+    for memory in memories:
+        stream.add_precomputed(memory)
+    return stream
+
+
+def queries(n, dim=32, seed=1):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("top_k", [1, 3, 10])
+def test_ranking_matches_reference(top_k):
+    memories = make_memories(500)
+    stream = fill(MemoryStream(), memories)
+    for query in queries(10):
+        got = [m.description for m in stream.retrieve_by_embedding(NOW, query, top_k)]
+        assert got == reference_top_k(memories, query, NOW, top_k)
+
+
+def test_ties_keep_insertion_order():
+    embedding = np.ones(8, dtype=np.float32) / np.sqrt(8)
+    memories = [Memory.precomputed(NOW, f"sama {i}", 5, embedding) for i in range(6)]
+    stream = fill(MemoryStream(), memories)
+    assert [m.description for m in stream.retrieve_by_embedding(NOW, embedding, 4)] == ["sama 0", "sama 1", "sama 2", "sama 3"]
+
+
+def test_cold_tier_does_not_change_ranking(tmp_path):
+    memories = make_memories(2000)
+    stream = fill(MemoryStream(ram_budget_mb=0.05, cold_dir=str(tmp_path)), memories)
+    try:
+        assert stream._cold is not None and stream._cold.size > 0
+        for query in queries(10):
+            got = [m.description for m in stream.retrieve_by_embedding(NOW, query, 5)]
+            assert got == reference_top_k(memories, query, NOW, 5)
+    finally:
+        stream.close()
+
+
+def test_ann_probing_every_list_matches_exact_scan():
+    memories = make_memories(3000)
+    stream = fill(MemoryStream(ann=True, ann_min_size=1000), memories)
+    assert stream.wait_for_ann(timeout=60)
+    assert stream.ann_stats() is not None
+    stream.ann_probe = stream.ann_stats()["lists"]
+    for query in queries(10):
+        ann = [m.description for m in stream.retrieve_by_embedding(NOW, query, 5)]
+        exact = [m.description for m in stream.retrieve_by_embedding(NOW, query, 5, exact=True)]
+        assert ann == exact == reference_top_k(memories, query, NOW, 5)
+
+
+@pytest.mark.parametrize("background", [True, False])
+def test_memories_added_during_rebuild_are_indexed(background, tmp_path):
+    memories = make_memories(6000)
+    stream = MemoryStream(ann=True, ann_min_size=1000, ann_background=background, ram_budget_mb=0.2, cold_dir=str(tmp_path))
+    try:
+        # 1000 -> pembangunan pertama, 4000 -> pembangunan ulang; penambahan jalan terus selama keduanya
+        fill(stream, memories)
+        assert stream.wait_for_ann(timeout=60)
+        assert stream._cold is not None and stream._cold.size > 0
+        stats = stream.ann_stats()
+        assert stats["size"] == len(stream) == len(memories)
+        assert stats["lists"] == IVFIndex.lists_for(4000)
+        stream.ann_probe = stats["lists"]
+        for query in queries(5):
+            ann = [m.description for m in stream.retrieve_by_embedding(NOW, query, 5)]
+            assert ann == reference_top_k(memories, query, NOW, 5)
+    finally:
+        stream.close()
@@ -0,0 +1,66 @@
+# file: tests/test_tick_scheduler.py
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from tick_scheduler import TickScheduler
+
+T0 = datetime(2024, 5, 1, 8, 0)
+SLOT = ("08:00", "Sarapan.")
+
+
+class FakeAgent:
+    def __init__(self, location="Rumah", status="Diam"):
+        self.location = location
+        self.status = status
+
+
+def decided(scheduler, agent, when=T0, observation="sepi", plan_slot=SLOT):
+    assert scheduler.should_decide(agent, when, observation, plan_slot)
+    scheduler.record_decision(agent, when, observation, plan_slot, (agent.location, agent.status))
+
+
+def test_every_tick_always_decides():
+    scheduler, agent = TickScheduler("every_tick"), FakeAgent()
+    for minute in range(3):
+        decided(scheduler, agent, T0 + timedelta(minutes=minute))
+    assert scheduler.stats()["triggers"] == {"every_tick": 3}
+    assert scheduler.skipped == 0
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        TickScheduler("sometimes")
+
+
+def test_event_driven_skips_unchanged_agent():
+    scheduler, agent = TickScheduler("event_driven", max_idle_minutes=15), FakeAgent()
+    assert scheduler.trigger_reason(agent, T0, "sepi", SLOT) == "first"
+    decided(scheduler, agent)
+    assert not scheduler.should_decide(agent, T0 + timedelta(minutes=1), "sepi", SLOT)
+    assert scheduler.stats()["skipped"] == 1
+
+
+@pytest.mark.parametrize("change, reason", [
+    (lambda agent, s: ("ramai", SLOT, T0 + timedelta(minutes=1)), "observation"),
+    (lambda agent, s: ("sepi", ("09:00", "Bekerja."), T0 + timedelta(minutes=1)), "plan_slot"),
+    (lambda agent, s: (setattr(agent, "status", "Dipanggil warga") or "sepi", SLOT, T0 + timedelta(minutes=1)), "state_changed"),
+    (lambda agent, s: (s.notify_event(agent) or "sepi", SLOT, T0 + timedelta(minutes=1)), "event"),
+    (lambda agent, s: ("sepi", SLOT, T0 + timedelta(minutes=15)), "idle"),
+])
+def test_event_driven_triggers(change, reason):
+    scheduler, agent = TickScheduler("event_driven", max_idle_minutes=15), FakeAgent()
+    decided(scheduler, agent)
+    observation, plan_slot, when = change(agent, scheduler)
+    assert scheduler.trigger_reason(agent, when, observation, plan_slot) == reason
+    assert scheduler.should_decide(agent, when, observation, plan_slot)
+    assert scheduler.stats()["triggers"][reason] == 1
+
+
+def test_event_is_consumed_by_decision():
+    scheduler, agent = TickScheduler("event_driven"), FakeAgent()
+    decided(scheduler, agent)
+    scheduler.notify_event(agent)
+    decided(scheduler, agent, T0 + timedelta(minutes=1))
+    assert scheduler.trigger_reason(agent, T0 + timedelta(minutes=2), "sepi", SLOT) is None
@@ -0,0 +1,96 @@
+# file: tick_scheduler.py
+
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+class _DecisionState(NamedTuple):
+    observation: str
+    plan_slot: Tuple[Optional[str], str]
+    result: Tuple[str, str]
+    decided_at: datetime
+
+
+class TickScheduler:
+    """
+    Menentukan apakah agen perlu memanggil LLM (decide_next_action) pada tick ini.
+
+    mode="every_tick": setiap agen memutuskan di setiap tick (perilaku awal).
+    mode="event_driven": agen hanya memutuskan jika ada pemicu:
+      - "first"         belum pernah memutuskan
+      - "event"         ada peristiwa eksternal sejak keputusan terakhir
+      - "observation"   teks observasi berbeda dari saat keputusan terakhir
+      - "plan_slot"     slot rencana harian berganti
+      - "state_changed" lokasi/status diubah pihak lain sejak keputusan terakhir
+      - "idle"          sudah max_idle_minutes menit simulasi tanpa keputusan
+    Jika tidak ada pemicu, agen tetap mengamati (memori bertambah) tetapi tetap di lokasi dan status yang sama.
+    """
+    MODES = ("every_tick", "event_driven")
+
+    def __init__(self, mode: str = "every_tick", max_idle_minutes: int = 15):
+        if mode not in self.MODES:
+            raise ValueError(f"scheduler harus salah satu dari {self.MODES}, bukan '{mode}'")
+        self.mode = mode
+        self.max_idle = timedelta(minutes=max_idle_minutes)
+        self._lock = threading.Lock()
+        self._states: Dict[object, _DecisionState] = {}
+        self._pending_events = set()
+        self._triggers = Counter()
+        self.decisions = 0
+        self.skipped = 0
+
+    def notify_event(self, agent):
+        """Menandai bahwa agen menerima peristiwa eksternal; keputusan berikutnya tidak akan dilewati."""
+        with self._lock:
+            self._pending_events.add(agent)
+
+    def trigger_reason(self, agent, current_time: datetime, observation: str, plan_slot) -> Optional[str]:
+        """Alasan agen perlu memutuskan, atau None jika keputusan bisa dilewati. Tidak mengubah statistik."""
+        if self.mode == "every_tick":
+            return "every_tick"
+        with self._lock:
+            state = self._states.get(agent)
+            if state is None:
+                return "first"
+            if agent in self._pending_events:
+                return "event"
+        if state.observation != observation:
+            return "observation"
+        if state.plan_slot != plan_slot:
+            return "plan_slot"
+        if state.result != (agent.location, agent.status):
+            return "state_changed"
+        if current_time - state.decided_at >= self.max_idle:
+            return "idle"
+        return None
+
+    def should_decide(self, agent, current_time: datetime, observation: str, plan_slot) -> bool:
+        reason = self.trigger_reason(agent, current_time, observation, plan_slot)
+        with self._lock:
+            if reason is None:
+                self.skipped += 1
+                return False
+            self._pending_events.discard(agent)
+            self._triggers[reason] += 1
+            self.decisions += 1
+        return True
+
+    def record_decision(self, agent, current_time: datetime, observation: str, plan_slot, result: Tuple[str, str]):
+        """result: (lokasi, status) agen setelah keputusan ini diterapkan."""
+        if self.mode == "every_tick":
+            return
+        with self._lock:
+            self._states[agent] = _DecisionState(observation, plan_slot, result, current_time)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.decisions + self.skipped
+            return {
+                "mode": self.mode,
+                "decisions": self.decisions,
+                "skipped": self.skipped,
+                "skip_ratio": self.skipped / total if total else 0.0,
+                "triggers": dict(self._triggers),
+            }
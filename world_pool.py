@@ -0,0 +1,389 @@
+# file: world_pool.py
+"""
+Banyak dunia simulasi independen yang disebar ke beberapa proses pekerja.
+
+Setiap pekerja adalah proses terpisah dengan model embedding dan GIL sendiri, dan menjalankan
+beberapa dunia (masing-masing satu SimulationRunner). Proses induk (api_server) hanya merutekan
+perintah ke pekerja pemilik dunia dan menyimpan snapshot terakhir setiap dunia, yang dikirim
+pekerja setelah setiap tick. Karena itu /worlds/{id}/state dilayani tanpa bolak-balik ke pekerja.
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Dict, List, Optional, Tuple
+
+from checkpoint import has_checkpoint, load_checkpoint
+from simulation_core import Agent, Environment, MemoryStream, embedding_model
+from simulation_runner import SimulationRunner, StateSnapshot
+
+_SHUTDOWN = "shutdown"
+# Selang (detik) pemeriksaan apakah proses pekerja masih hidup
+_LIVENESS_INTERVAL = 1.0
+
+
+class WorldNotFoundError(KeyError):
+    """Tidak ada dunia dengan id tersebut."""
+
+
+class WorldExistsError(ValueError):
+    """Dunia dengan id tersebut sudah ada."""
+
+
+class WorkerDiedError(RuntimeError):
+    """Proses pekerja berhenti (crash, OOM, dibunuh) sebelum membalas perintah."""
+
+
+def build_world(config: dict) -> Environment:
+    """
+    Membangun Environment dari konfigurasi JSON (tanpa memanggil LLM; lihat plan_days):
+    {"start_time": "08:00", "step_mode": ..., "scheduler": ..., "reflection_mode": ..., "batch_importance": ...,
+     "plan_day": true, "ann_index": false, "agents": [{"name": ..., "description": ..., "location": ...}, ...]}
+    ann_index=true memberi setiap agen MemoryStream dengan indeks ANN (untuk dunia berumur panjang).
+    """
+    env = Environment(start_time_str=config.get("start_time", "08:00"),
+                      step_mode=config.get("step_mode", "sequential"),
+                      reflection_mode=config.get("reflection_mode", "inline"),
+                      scheduler=config.get("scheduler", "every_tick"),
+                      batch_importance=config.get("batch_importance"))
+    for spec in config.get("agents", []):
+        env.add_agent(Agent(name=spec["name"], description=spec["description"], location=spec["location"],
+                            memory_stream=MemoryStream(ann=config.get("ann_index", False))))
+    return env
+
+
+def plan_days(env: Environment):
+    """Rencana harian semua agen; dijalankan di thread runner dunia itu, bukan di loop perintah pekerja."""
+    for agent in env.agents:
+        agent.plan_day()
+
+
+class _Worker:
+    """Sisi proses pekerja: menjalankan perintah dari induk satu per satu."""
+    def __init__(self, index: int, outbox, checkpoint_root: Optional[str], step_interval: float):
+        self.index = index
+        self.outbox = outbox
+        self.checkpoint_root = checkpoint_root
+        self.step_interval = step_interval
+        self.runners = {}
+
+    def _checkpoint_path(self, world_id: str) -> Optional[str]:
+        return os.path.join(self.checkpoint_root, world_id) if self.checkpoint_root else None
+
+    def _runner(self, world_id: str):
+        runner = self.runners.get(world_id)
+        if runner is None:
+            raise WorldNotFoundError(world_id)
+        return runner
+
+    def _publish(self, world_id: str, runner, snapshot: StateSnapshot):
+        self.outbox.put(("snapshot", world_id, (snapshot.instance_id, snapshot.version, snapshot.simulation_time,
+                                                snapshot.agents, runner.paused)))
+
+    def create(self, world_id: str, config: dict) -> dict:
+        if world_id in self.runners:
+            raise WorldExistsError(world_id)
+        path = self._checkpoint_path(world_id)
+        restored = bool(path) and has_checkpoint(path)
+        env = load_checkpoint(path) if restored else build_world(config)
+        setup = plan_days if not restored and config.get("plan_day", True) else None
+        runner = SimulationRunner(env, step_interval=config.get("step_interval", self.step_interval),
+                                  checkpoint_path=path, checkpoint_every=config.get("checkpoint_every", 60), setup=setup)
+        runner.add_listener(lambda snapshot: self._publish(world_id, runner, snapshot))
+        self.runners[world_id] = runner
+        if config.get("paused", False):
+            runner.pause()
+        self._publish(world_id, runner, runner.snapshot)
+        runner.start()
+        return {"restored": restored}
+
+    def delete(self, world_id: str, _payload=None) -> dict:
+        runner = self._runner(world_id)
+        if runner.stop(timeout=30):
+            runner.env.shutdown()
+        del self.runners[world_id]
+        path = self._checkpoint_path(world_id)
+        if path: shutil.rmtree(path, ignore_errors=True)
+        return {}
+
+    def pause(self, world_id: str, _payload=None) -> dict:
+        runner = self._runner(world_id)
+        runner.pause()
+        self._publish(world_id, runner, runner.snapshot)
+        return {}
+
+    def resume(self, world_id: str, _payload=None) -> dict:
+        runner = self._runner(world_id)
+        runner.resume()
+        self._publish(world_id, runner, runner.snapshot)
+        return {}
+
+    def event(self, world_id: str, event_description: str) -> dict:
+        self._runner(world_id).submit_event(event_description)
+        return {}
+
+    def events(self, world_id: str, events: List[dict]) -> dict:
+        self._runner(world_id).submit_events(events)
+        return {}
+
+    def stop_all(self):
+        for runner in self.runners.values():
+            if runner.stop(timeout=30):
+                runner.env.shutdown()
+
+
+def _worker_main(index: int, inbox, outbox, checkpoint_root: Optional[str], step_interval: float):
+    embedding_model.warm_up(background=True)
+    worker = _Worker(index, outbox, checkpoint_root, step_interval)
+    handlers = {"create": worker.create, "delete": worker.delete, "pause": worker.pause,
+                "resume": worker.resume, "event": worker.event, "events": worker.events}
+    while True:
+        request_id, command, world_id, payload = inbox.get()
+        if command == _SHUTDOWN:
+            worker.stop_all()
+            outbox.put(("reply", request_id, (True, None)))
+            return
+        try:
+            outbox.put(("reply", request_id, (True, handlers[command](world_id, payload))))
+        except (WorldNotFoundError, WorldExistsError) as e:
+            outbox.put(("reply", request_id, (False, e)))
+        except Exception as e:
+            # Pengecualian lain belum tentu bisa di-pickle; kirim sebagai teks
+            outbox.put(("reply", request_id, (False, RuntimeError(f"{type(e).__name__}: {e}"))))
+
+
+class _WorldInfo:
+    __slots__ = ("world_id", "worker", "snapshot", "paused")
+
+    def __init__(self, world_id: str, worker: int):
+        self.world_id = world_id
+        self.worker = worker
+        self.snapshot: Optional[StateSnapshot] = None
+        self.paused = False
+
+
+class WorldPool:
+    """
+    Sisi proses induk. Proses pekerja baru dijalankan saat dunia pertama dibuat; dunia baru
+    ditempatkan di pekerja dengan dunia paling sedikit. Semua perintah mengembalikan
+    concurrent.futures.Future (pakai asyncio.wrap_future di dalam FastAPI).
+
+    Jika proses pekerja mati, semua perintah yang menunggu balasannya gagal dengan WorkerDiedError,
+    dunia-dunianya dihapus dari daftar, dan proses pengganti dijalankan di slot yang sama. Dunia yang
+    punya checkpoint bisa dipulihkan dengan membuatnya lagi (create_world).
+    """
+    def __init__(self, num_workers: int = 2, checkpoint_root: Optional[str] = None, step_interval: float = 1.0):
+        self.num_workers = max(1, num_workers)
+        self.checkpoint_root = checkpoint_root
+        self.step_interval = step_interval
+        # spawn: proses induk sudah punya thread (uvicorn, simulasi), fork tidak aman di sini
+        self._ctx = multiprocessing.get_context("spawn")
+        self._processes: List = []
+        self._inboxes: List = []
+        self._outbox = None
+        self._reader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._pending: Dict[int, Tuple[int, Future]] = {}  # request id -> (pekerja, future)
+        self._last_liveness_check = 0.0
+        self._closing = False
+        self._worlds: Dict[str, _WorldInfo] = {}
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._processes: return
+            outbox = self._ctx.Queue()
+            started = []
+            try:
+                for index in range(self.num_workers):
+                    started.append(self._spawn_worker(index, outbox))
+            except Exception:
+                # Semua atau tidak sama sekali: jangan tinggalkan pekerja setengah jalan
+                for process, _ in started:
+                    process.terminate()
+                raise
+            self._outbox = outbox
+            with self._lock:
+                self._processes = [process for process, _ in started]
+                self._inboxes = [inbox for _, inbox in started]
+            self._reader = threading.Thread(target=self._read_outbox, name="world-pool-reader", daemon=True)
+            self._reader.start()
+
+    def _spawn_worker(self, index: int, outbox) -> Tuple[object, object]:
+        inbox = self._ctx.Queue()
+        process = self._ctx.Process(target=_worker_main, name=f"world-worker-{index}", daemon=True,
+                                    args=(index, inbox, outbox, self.checkpoint_root, self.step_interval))
+        process.start()
+        return process, inbox
+
+    def _check_workers(self):
+        """Menggagalkan perintah yang menunggu pekerja mati, membuang dunianya, lalu menjalankan pengganti."""
+        for index, process in enumerate(self._processes):
+            if self._closing: return
+            if process is None or process.is_alive(): continue
+            error = WorkerDiedError(f"Proses pekerja {index} berhenti (exit code {process.exitcode})")
+            with self._lock:
+                failed = [rid for rid, (worker, _) in self._pending.items() if worker == index]
+                futures = [self._pending.pop(rid)[1] for rid in failed]
+                lost = [world_id for world_id, info in self._worlds.items() if info.worker == index]
+                for world_id in lost:
+                    del self._worlds[world_id]
+                try:
+                    self._processes[index], self._inboxes[index] = self._spawn_worker(index, self._outbox)
+                    replacement = "Pekerja pengganti dijalankan."
+                except Exception as e:
+                    # Slot dibiarkan kosong; dunia baru ditempatkan di pekerja lain
+                    self._processes[index], self._inboxes[index] = None, None
+                    replacement = f"Pekerja pengganti gagal dijalankan: {e}"
+            print(f"Proses pekerja {index} berhenti (exit code {process.exitcode}); "
+                  f"{len(lost)} dunia dilepas, {len(futures)} perintah digagalkan. {replacement}")
+            for future in futures:
+                self._resolve(future, False, error)
+
+    @staticmethod
+    def _resolve(future: Future, ok: bool, result):
+        # Future bisa sudah dibatalkan pemanggil (mis. timeout di _call_world)
+        try:
+            if ok: future.set_result(result)
+            else: future.set_exception(result)
+        except InvalidStateError:
+            pass
+
+    def _read_outbox(self):
+        while True:
+            if time.monotonic() - self._last_liveness_check >= _LIVENESS_INTERVAL:
+                self._last_liveness_check = time.monotonic()
+                self._check_workers()
+            try:
+                message = self._outbox.get(timeout=_LIVENESS_INTERVAL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            kind = message[0]
+            if kind == "snapshot":
+                _, world_id, (instance_id, version, simulation_time, agents, paused) = message
+                with self._lock:
+                    info = self._worlds.get(world_id)
+                    if info is not None and (info.snapshot is None or info.snapshot.instance_id != instance_id
+                                             or version >= info.snapshot.version):
+                        info.snapshot = StateSnapshot(version, simulation_time, agents, instance_id)
+                        info.paused = paused
+            elif kind == "reply":
+                _, request_id, (ok, result) = message
+                with self._lock:
+                    pending = self._pending.pop(request_id, None)
+                if pending is None: continue
+                self._resolve(pending[1], ok, result)
+
+    def _send(self, worker: int, command: str, world_id: Optional[str], payload=None) -> Future:
+        future: Future = Future()
+        with self._lock:
+            inbox = self._inboxes[worker] if worker < len(self._inboxes) else None
+            if inbox is None:
+                raise WorkerDiedError(f"Proses pekerja {worker} tidak berjalan")
+            request_id = next(self._request_ids)
+            self._pending[request_id] = (worker, future)
+        inbox.put((request_id, command, world_id, payload))
+        return future
+
+    def _worker_of(self, world_id: str) -> int:
+        with self._lock:
+            info = self._worlds.get(world_id)
+        if info is None:
+            raise WorldNotFoundError(world_id)
+        return info.worker
+
+    def create_world(self, world_id: str, config: dict) -> Future:
+        # Pekerja dijalankan dulu; jika gagal, dunia tidak pernah terdaftar
+        self._ensure_started()
+        with self._lock:
+            if world_id in self._worlds:
+                raise WorldExistsError(world_id)
+            available = [index for index, inbox in enumerate(self._inboxes) if inbox is not None]
+            if not available:
+                raise WorkerDiedError("Tidak ada proses pekerja yang berjalan")
+            load = [0] * self.num_workers
+            for info in self._worlds.values():
+                load[info.worker] += 1
+            worker = min(available, key=load.__getitem__)
+            self._worlds[world_id] = _WorldInfo(world_id, worker)
+        try:
+            future = self._send(worker, "create", world_id, config)
+        except Exception:
+            with self._lock:
+                self._worlds.pop(world_id, None)
+            raise
+
+        def _forget_on_error(done: Future):
+            if not done.cancelled() and done.exception() is not None:
+                with self._lock:
+                    self._worlds.pop(world_id, None)
+        future.add_done_callback(_forget_on_error)
+        return future
+
+    def delete_world(self, world_id: str) -> Future:
+        future = self._send(self._worker_of(world_id), "delete", world_id)
+
+        def _forget(done: Future):
+            if not done.cancelled() and done.exception() is None:
+                with self._lock:
+                    self._worlds.pop(world_id, None)
+        future.add_done_callback(_forget)
+        return future
+
+    def pause_world(self, world_id: str) -> Future:
+        return self._send(self._worker_of(world_id), "pause", world_id)
+
+    def resume_world(self, world_id: str) -> Future:
+        return self._send(self._worker_of(world_id), "resume", world_id)
+
+    def submit_event(self, world_id: str, event_description: str) -> Future:
+        return self._send(self._worker_of(world_id), "event", world_id, event_description)
+
+    def submit_events(self, world_id: str, events: List[dict]) -> Future:
+        return self._send(self._worker_of(world_id), "events", world_id, events)
+
+    def snapshot(self, world_id: str) -> Optional[StateSnapshot]:
+        with self._lock:
+            info = self._worlds.get(world_id)
+        if info is None:
+            raise WorldNotFoundError(world_id)
+        return info.snapshot
+
+    def list_worlds(self) -> List[dict]:
+        with self._lock:
+            infos = list(self._worlds.values())
+        return [{
+            "id": info.world_id,
+            "worker": info.worker,
+            "ready": info.snapshot is not None,
+            "paused": info.paused,
+            "simulation_time": info.snapshot.simulation_time if info.snapshot else None,
+            "agents": len(info.snapshot.agents) if info.snapshot else 0,
+        } for info in infos]
+
+    def shutdown(self, timeout: float = 30.0):
+        if not self._processes: return
+        self._closing = True
+        futures = [self._send(worker, _SHUTDOWN, None)
+                   for worker, inbox in enumerate(self._inboxes) if inbox is not None]
+        for future in futures:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+        for process in self._processes:
+            if process is None: continue
+            process.join(timeout)
+            if process.is_alive(): process.terminate()
+        self._outbox.put(None)
+        self._processes, self._inboxes = [], []